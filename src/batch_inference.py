@@ -0,0 +1,77 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchInferenceQueue:
+    """
+    Collects single-item inference requests from many threads and runs them
+    as one batched call. A batch takes whatever is queued and is flushed as soon
+    as nothing else is pending; requests arriving meanwhile form the next batch.
+    With in_flight (number of callers that may still submit, e.g. camera cycles
+    running right now) it waits for those, up to max_wait, while the batch is smaller.
+    """
+    def __init__(self, name, predict_batch, max_batch_size=8, max_wait=0.05, in_flight=None):
+        self.name = name
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max_wait
+        self.in_flight = in_flight
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"batch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item):
+        """Blocking helper: submit one item and wait for its own result."""
+        return self.submit(item).result()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _expecting_more(self, batch_size) -> bool:
+        if self.in_flight is None:
+            return False
+        try:
+            return self.in_flight() > batch_size
+        except Exception:
+            return False
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            # Nothing else queued: only wait if other callers are still on their way
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._expecting_more(len(batch)):
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.005)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self.predict_batch(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
@@ -0,0 +1,293 @@
+"""
+Offline micro-benchmarks for the detection and alert hot paths.
+
+    python benchmark.py                          # synthetic frames, all suites
+    python benchmark.py --video clip.mp4         # frames from a recording
+    python benchmark.py --source rtsp://...      # frame acquisition against a real stream
+    python benchmark.py --compare old.json       # print the change against an earlier run
+
+Nothing here talks to YouTube, Discord or the cameras: alerts go to a local HTTP stub.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from config import CAMERA_CONFIG, DEVICE_TYPE, FRONT_MODEL, BACK_MODEL, IMAGE_SIZE
+from utils import print_message, encode_thumbnail
+
+DEFAULT_SIZES = "640x360,1280x720,1920x1080"
+DEFAULT_BATCH_SIZES = "1,2,4,8"
+
+
+def measure(name, function, repeat, warmup=2, **params):
+    """Run function warmup + repeat times and summarise the timed runs."""
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    result = {
+        "name": name,
+        "params": params,
+        "runs": repeat,
+        "mean": statistics.fmean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "min": timings[0],
+        "max": timings[-1],
+    }
+    print_message(f"{name} {params}: mean {result['mean'] * 1000:.2f} ms, p95 {result['p95'] * 1000:.2f} ms")
+    return result
+
+
+def parse_sizes(value):
+    return [tuple(int(part) for part in size.split("x")) for size in value.split(",") if size]
+
+
+def synthetic_frame(width, height, seed=0):
+    """Noise over a gradient: compresses like a camera image rather than a flat colour."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    frame = np.broadcast_to(gradient, (height, width, 3)).copy()
+    noise = rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+    return cv2.add(frame, noise)
+
+
+def load_frames(video_path, sizes, count):
+    """One list of frames per size, from a recording or synthetic."""
+    frames = {size: [] for size in sizes}
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        while cap.isOpened() and len(frames[sizes[0]]) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            for width, height in sizes:
+                frames[(width, height)].append(cv2.resize(frame, (width, height)))
+        cap.release()
+        if not frames[sizes[0]]:
+            raise SystemExit(f"Could not read frames from {video_path}")
+    else:
+        for width, height in sizes:
+            frames[(width, height)] = [synthetic_frame(width, height, seed) for seed in range(count)]
+    return frames
+
+
+def write_synthetic_clip(path, width=1280, height=720, count=250, fps=25):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for seed in range(count):
+        writer.write(synthetic_frame(width, height, seed))
+    writer.release()
+    return path
+
+
+# --- Suites ---
+
+def bench_models(frames, batch_sizes, repeat):
+    from gatekeeper import YOLO26Gatekeeper, FRONT_MODEL_PATH, BACK_MODEL_PATH
+    from roi import crop_regions
+
+    gatekeeper = YOLO26Gatekeeper(FRONT_MODEL_PATH, BACK_MODEL_PATH)
+    results = []
+    for (width, height), size_frames in frames.items():
+        frame = size_frames[0]
+        results.append(measure(
+            "front_has_targets", lambda: gatekeeper.front_has_targets(frame, "benchmark"),
+            repeat, width=width, height=height))
+
+        for batch_size in batch_sizes:
+            batch = [size_frames[i % len(size_frames)] for i in range(batch_size)]
+            results.append(measure(
+                "front_predict_batch", lambda: gatekeeper.front_predict_batch(batch),
+                repeat, width=width, height=height, batch_size=batch_size))
+
+        # Inference only: back_has_targets would also write thumbnails, Redis entries and tracker state
+        results.append(measure(
+            "back_predict", lambda: gatekeeper.back_predict_batch([frame]),
+            repeat, width=width, height=height, roi=False))
+
+        # A person-sized box in the middle of the frame exercises the crop-verify path
+        box = (width * 0.4, height * 0.3, width * 0.6, height * 0.9)
+
+        def roi_verify():
+            regions = crop_regions(frame, [box]) or []
+            gatekeeper.back_predict_batch([crop for _, _, crop in regions])
+        results.append(measure("back_predict", roi_verify, repeat, width=width, height=height, roi=True))
+    return results
+
+
+def bench_frame_acquisition(source, repeat):
+    from frame_grabber import FrameGrabber, open_capture, KEYFRAMES_ONLY
+
+    def per_call():
+        # What CameraWorker does without a persistent grabber: open, skip ahead, read, close
+        cap = open_capture(source)
+        if not cap.isOpened():
+            return None
+        if not KEYFRAMES_ONLY:
+            for _ in range(5):
+                cap.grab()
+        ret, frame = cap.read()
+        cap.release()
+        return frame if ret else None
+
+    results = [measure("get_fresh_frame", per_call, repeat, warmup=1, mode="per_call")]
+
+    grabber = FrameGrabber("benchmark", source)
+    grabber.start()
+    deadline = time.time() + 10
+    while grabber.read() is None and time.time() < deadline:
+        time.sleep(0.05)
+    results.append(measure("get_fresh_frame", grabber.read, repeat, mode="persistent"))
+    grabber.stop()
+    return results
+
+
+def bench_thumbnail(frames, repeat):
+    results = []
+    for (width, height), size_frames in frames.items():
+        frame = size_frames[0]
+        result = measure("encode_thumbnail", lambda: encode_thumbnail(cv2, frame), repeat, width=width, height=height)
+        results.append(result)
+        print_message(f"encode_thumbnail {result['params']}: mean {result['mean'] * 1000:.2f} ms")
+    return results
+
+
+class _WebhookStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like Discord
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.server.received.set()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_webhook(repeat):
+    import http.client
+    import webhook
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _WebhookStub)
+    server.received = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_port}/api/webhooks/benchmark"
+
+    class StubDispatcher(webhook.AlertDispatcher):
+        # Same queueing, coalescing and retry code; only the transport points at the stub
+        def submit(self, webhook_url, content):
+            super().submit(stub_url, content)
+
+        def _connection(self, webhook_url):
+            conn = self._connections.get(webhook_url)
+            if conn is None:
+                conn = http.client.HTTPConnection(f"127.0.0.1:{server.server_port}", timeout=webhook.TIMEOUT)
+                self._connections[webhook_url] = conn
+            return conn
+
+    dispatcher = StubDispatcher()
+    webhook._dispatcher = dispatcher
+    camera = next(iter(CAMERA_CONFIG))
+
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        # What the detection path pays: build the message and enqueue it
+        enqueue = measure("send_webhook", lambda: webhook.send_webhook(camera, stub_url, "person (0.90)"),
+                          repeat, stage="enqueue")
+        # One delivery over the kept-alive connection (its own, the sender thread may still be busy with stub_url)
+        post = measure("send_webhook", lambda: dispatcher._post(f"{stub_url}?direct", "benchmark"),
+                       repeat, stage="post")
+
+        def end_to_end():
+            server.received.clear()
+            webhook.send_webhook(camera, stub_url, "person (0.90)")
+            server.received.wait(timeout=30)
+        # Includes the coalescing window, so expect roughly WEBHOOK COALESCE_WINDOW
+        delivered = measure("send_webhook", end_to_end, min(repeat, 5), warmup=1, stage="delivered")
+    results.extend([enqueue, post, delivered])
+    for result in results:
+        print_message(f"send_webhook {result['params']}: mean {result['mean'] * 1000:.2f} ms")
+    server.shutdown()
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in baseline["results"]}
+    for result in results:
+        old = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is None or not old["mean"]:
+            continue
+        change = (result["mean"] - old["mean"]) / old["mean"] * 100
+        print(f"{result['name']:<28} {json.dumps(result['params']):<55} "
+              f"{old['mean'] * 1000:9.2f} ms -> {result['mean'] * 1000:9.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection and alert hot paths.")
+    parser.add_argument("--video", help="Recording to take frames from (default: synthetic frames)")
+    parser.add_argument("--source", help="File or RTSP URL for frame acquisition (default: --video or a synthetic clip)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Frame sizes WxH (default: {DEFAULT_SIZES})")
+    parser.add_argument("--batch-sizes", default=DEFAULT_BATCH_SIZES, help=f"Front batch sizes (default: {DEFAULT_BATCH_SIZES})")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case")
+    parser.add_argument("--suites", default="models,frames,thumbnail,webhook", help="Comma-separated suites to run")
+    parser.add_argument("--output", help="JSON report path (default: benchmark-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    suites = set(args.suites.split(","))
+    sizes = parse_sizes(args.sizes)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size]
+    frames = load_frames(args.video, sizes, max(batch_sizes))
+
+    results = []
+    if "models" in suites:
+        results += bench_models(frames, batch_sizes, args.repeat)
+    if "frames" in suites:
+        with tempfile.TemporaryDirectory() as directory:
+            source = args.source or args.video or write_synthetic_clip(os.path.join(directory, "clip.mp4"))
+            results += bench_frame_acquisition(source, args.repeat)
+    if "thumbnail" in suites:
+        results += bench_thumbnail(frames, args.repeat)
+    if "webhook" in suites:
+        results += bench_webhook(args.repeat)
+
+    started = datetime.datetime.now()
+    report = {
+        "created": started.isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+                    "python": platform.python_version(), "opencv": cv2.__version__},
+        "config": {"device": DEVICE_TYPE, "front_model": FRONT_MODEL, "back_model": BACK_MODEL, "image_size": IMAGE_SIZE,
+                   "frames": "recorded" if args.video else "synthetic", "repeat": args.repeat},
+        "results": results,
+    }
+    output = args.output or f"benchmark-{started:%Y%m%d-%H%M%S}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_message(f"Report written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
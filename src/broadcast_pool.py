@@ -0,0 +1,166 @@
+import threading
+import time
+from generate_token import get_authenticated_service
+from utils import print_message
+from youtube import prepare_broadcast, delete_broadcast, update_broadcast_title, gen_start_time, gen_stream_name_desc
+from redis_utils import save_prepared_broadcast_to_redis, get_prepared_broadcast_from_redis, delete_prepared_broadcast_from_redis
+from config import BROADCAST_POOL
+
+MAX_AGE = BROADCAST_POOL.get("MAX_AGE", 7 * 24 * 3600)
+REFILL_INTERVAL = BROADCAST_POOL.get("REFILL_INTERVAL", 30)
+
+
+class BroadcastPool:
+    """
+    Keeps one created-and-bound YouTube broadcast ready per camera.
+    A trigger only has to take it and transition it to live; the pool refills
+    in the background and renames used broadcasts. Unused ones are kept for days
+    (replacing one costs ~150 quota units) and only replaced after MAX_AGE.
+    """
+    def __init__(self, cameras):
+        self.cameras = list(cameras)
+        self._ready = {}
+        self._retitle = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="broadcast-pool", daemon=True)
+
+    def _adopt(self, camera):
+        # Broadcasts prepared before a restart, or by the worker that owned the camera before
+        try:
+            prepared = get_prepared_broadcast_from_redis(camera)
+        except Exception as e:
+            print_message(f"[{camera}] Could not load prepared broadcast: {e}")
+            return
+        if prepared:
+            with self._lock:
+                self._ready[camera] = prepared
+
+    def start(self):
+        for camera in self.cameras:
+            self._adopt(camera)
+        self._thread.start()
+
+    def add_camera(self, camera: str) -> None:
+        with self._lock:
+            if camera in self.cameras:
+                return
+            self.cameras.append(camera)
+        self._adopt(camera)
+        self._wake.set()
+
+    def remove_camera(self, camera: str) -> None:
+        """Stop refilling this camera; its prepared broadcast stays in Redis for the next owner."""
+        with self._lock:
+            if camera in self.cameras:
+                self.cameras.remove(camera)
+            self._ready.pop(camera, None)
+
+    def take(self, camera: str) -> str | None:
+        """Hand out the ready broadcast for this camera (or None) and schedule a refill."""
+        with self._lock:
+            prepared = self._ready.pop(camera, None)
+        if prepared is None:
+            return None
+
+        broadcast_id, created_at = prepared
+        if time.time() - created_at > MAX_AGE:
+            # Stale entries are cleaned up by the pool thread, not on the trigger path
+            with self._lock:
+                self._ready[camera] = prepared
+            return None
+
+        with self._lock:
+            self._retitle.append((camera, broadcast_id))
+        self._wake.set()
+        return broadcast_id
+
+    def _refill(self, youtube, camera):
+        with self._lock:
+            prepared = self._ready.get(camera)
+
+        if prepared is None:
+            # The previous one was taken; never let a restart adopt a used broadcast
+            delete_prepared_broadcast_from_redis(camera)
+        else:
+            broadcast_id, created_at = prepared
+            if time.time() - created_at <= MAX_AGE:
+                return
+            with self._lock:
+                # A trigger may have taken it meanwhile
+                if self._ready.get(camera) != prepared:
+                    return
+                del self._ready[camera]
+            try:
+                delete_broadcast(youtube, broadcast_id)
+                print_message(f"[{camera}] Deleted stale prepared broadcast {broadcast_id}")
+            except Exception as e:
+                print_message(f"[{camera}] Could not delete stale broadcast {broadcast_id}: {e}")
+
+        broadcast_id = prepare_broadcast(youtube, camera)
+        created_at = time.time()
+        with self._lock:
+            self._ready[camera] = (broadcast_id, created_at)
+        save_prepared_broadcast_to_redis(camera, broadcast_id, created_at)
+
+    def _rename_used(self, youtube):
+        with self._lock:
+            used, self._retitle = self._retitle, []
+
+        for camera, broadcast_id in used:
+            # The title carries the creation time; make it match when the event happened
+            start_time = gen_start_time()
+            title, _ = gen_stream_name_desc(camera, start_time)
+            try:
+                update_broadcast_title(youtube, broadcast_id, title, start_time)
+            except Exception as e:
+                print_message(f"[{camera}] Could not rename broadcast {broadcast_id}: {e}")
+
+    def _run(self):
+        while True:
+            try:
+                youtube = get_authenticated_service()
+            except Exception as e:
+                print_message(f"Broadcast pool could not reach YouTube: {e}")
+                youtube = None
+
+            if youtube is not None:
+                self._rename_used(youtube)
+                with self._lock:
+                    cameras = list(self.cameras)
+                for camera in cameras:
+                    try:
+                        self._refill(youtube, camera)
+                    except Exception as e:
+                        print_message(f"[{camera}] Broadcast pool refill failed: {e}")
+
+            self._wake.wait(timeout=REFILL_INTERVAL)
+            self._wake.clear()
+
+
+_pool = None
+
+
+def start_broadcast_pool(cameras) -> None:
+    global _pool
+    if _pool is not None or not BROADCAST_POOL.get("ENABLED", True):
+        return
+    _pool = BroadcastPool(cameras)
+    _pool.start()
+
+
+def add_broadcast_pool_camera(camera: str) -> None:
+    if _pool is not None:
+        _pool.add_camera(camera)
+
+
+def remove_broadcast_pool_camera(camera: str) -> None:
+    if _pool is not None:
+        _pool.remove_camera(camera)
+
+
+def take_prepared_broadcast(camera: str) -> str | None:
+    """Pre-provisioned broadcast ID for this camera, or None when the pool is off or empty."""
+    if _pool is None:
+        return None
+    return _pool.take(camera)
@@ -0,0 +1,138 @@
+import math
+import os
+import socket
+import threading
+import time
+import zlib
+from config import CAMERA_CONFIG, SHARDING
+from utils import print_message
+from redis_utils import redis_client
+
+LEASE_TTL = SHARDING.get("LEASE_TTL", 15)
+RENEW_INTERVAL = SHARDING.get("RENEW_INTERVAL", 5)
+WORKERS_KEY = "detector:workers"
+
+# Only the holder may extend or drop a lease
+RENEW_SCRIPT = redis_client.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+""")
+RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+
+
+def lease_key(camera_name: str) -> str:
+    return f"lease:camera:{camera_name}"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseManager:
+    """
+    Splits CAMERA_CONFIG across detector processes with renewable Redis leases.
+    Every worker heartbeats into a sorted set; each one claims up to its fair share
+    (cameras / live workers), preferring cameras by rendezvous hash so ownership stays
+    stable. Extra cameras are given back when a worker joins, and expired leases of a
+    dead worker are picked up by the others.
+
+    on_acquire(camera) starts working a camera. on_release(camera, lost) stops it and
+    returns False to keep the lease (e.g. the camera is streaming); lost=True means the
+    lease already expired and the camera must be dropped regardless.
+    """
+    def __init__(self, on_acquire, on_release, worker_id=None, cameras=None):
+        self.worker_id = worker_id or SHARDING.get("WORKER_ID") or default_worker_id()
+        self.cameras = list(cameras if cameras is not None else CAMERA_CONFIG.keys())
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.owned = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="camera-leases", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def holds(self, camera_name: str) -> bool:
+        """Checked right before a stream starts, so two workers never start the same camera."""
+        try:
+            return redis_client.get(lease_key(camera_name)) == self.worker_id
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not check lease: {e}")
+            return False
+
+    def _live_workers(self, now_ms) -> int:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.zadd(WORKERS_KEY, {self.worker_id: now_ms})
+        pipe.zremrangebyscore(WORKERS_KEY, "-inf", now_ms - LEASE_TTL * 1000)
+        pipe.zcard(WORKERS_KEY)
+        return max(pipe.execute()[2], 1)
+
+    def _preference(self, camera_name):
+        return zlib.crc32(f"{self.worker_id}:{camera_name}".encode())
+
+    def _renew(self):
+        for camera_name in sorted(self.owned):
+            if RENEW_SCRIPT(keys=[lease_key(camera_name)], args=[self.worker_id, LEASE_TTL * 1000]):
+                continue
+            print_message(f"[{camera_name}] Lease lost to another worker.")
+            self.owned.discard(camera_name)
+            self._call_release(camera_name, lost=True)
+
+    def _call_release(self, camera_name, lost):
+        try:
+            return self.on_release(camera_name, lost)
+        except Exception as e:
+            print_message(f"[{camera_name}] Release failed: {e}")
+            return False
+
+    def _rebalance(self, fair_share):
+        # Give back the cameras we like least first
+        for camera_name in sorted(self.owned, key=self._preference)[:max(len(self.owned) - fair_share, 0)]:
+            if not self._call_release(camera_name, lost=False):
+                continue
+            RELEASE_SCRIPT(keys=[lease_key(camera_name)], args=[self.worker_id])
+            self.owned.discard(camera_name)
+            print_message(f"[{camera_name}] Released to rebalance ({len(self.owned)}/{fair_share}).")
+
+        for camera_name in sorted(self.cameras, key=self._preference, reverse=True):
+            if len(self.owned) >= fair_share:
+                break
+            if camera_name in self.owned:
+                continue
+            if not redis_client.set(lease_key(camera_name), self.worker_id, nx=True, px=LEASE_TTL * 1000):
+                continue
+            self.owned.add(camera_name)
+            print_message(f"[{camera_name}] Lease acquired by {self.worker_id}.")
+            try:
+                self.on_acquire(camera_name)
+            except Exception as e:
+                print_message(f"[{camera_name}] Could not start camera: {e}")
+                RELEASE_SCRIPT(keys=[lease_key(camera_name)], args=[self.worker_id])
+                self.owned.discard(camera_name)
+
+    def _run(self):
+        print_message(f"Worker {self.worker_id} joining with lease TTL {LEASE_TTL}s.")
+        last_renewed = time.monotonic()
+        while True:
+            try:
+                with self._lock:
+                    self._renew()
+                    last_renewed = time.monotonic()
+                    workers = self._live_workers(int(time.time() * 1000))
+                    self._rebalance(math.ceil(len(self.cameras) / workers))
+            except Exception as e:
+                print_message(f"Lease renewal failed: {e}")
+                # Redis unreachable: drop our cameras before the leases can expire and be taken by someone else
+                if time.monotonic() - last_renewed >= LEASE_TTL - RENEW_INTERVAL:
+                    with self._lock:
+                        for camera_name in list(self.owned):
+                            self.owned.discard(camera_name)
+                            self._call_release(camera_name, lost=True)
+            time.sleep(RENEW_INTERVAL)
@@ -0,0 +1,31 @@
+"""
+Capture process started by shm_frames.SharedFrameSource, one per camera.
+
+    python capture_main.py <camera_name> <url> <ring_name> <height> <width> <slots>
+
+Decodes into the shared memory ring created by the detector and takes commands
+as JSON lines on stdin. Only the decoder is imported here, never the models or API clients.
+"""
+import sys
+import threading
+from multiprocessing import resource_tracker
+from shm_frames import FrameRing, RingFrameGrabber
+
+
+def main():
+    camera_name, url, ring_name, height, width, slots = sys.argv[1:7]
+    ring = FrameRing(ring_name, (int(height), int(width), 3), int(slots))
+    # The detector owns the segment; without this our own resource tracker would unlink it when we exit
+    resource_tracker.unregister(ring.shm._name, "shared_memory")
+
+    grabber = RingFrameGrabber(camera_name, url, ring)
+    grabber._running = True
+    threading.Thread(target=grabber.listen, args=(sys.stdin,), daemon=True).start()
+    try:
+        grabber._capture_loop()
+    finally:
+        ring.close()
+
+
+if __name__ == "__main__":
+    main()
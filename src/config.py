@@ -1,16 +1,22 @@
+# Optional per camera: "CHECK_INTERVAL", "CHECK_INTERVAL_MIN", "CHECK_INTERVAL_MAX" (seconds)
+# "DETECT_STREAM_URL": stream used for detection (e.g. the camera substream); without it the
+# last character of STREAM_URL is replaced with "1"
 CAMERA_CONFIG = {
     "Balcony": {
         "STREAM_URL": "RTSP URL",
+        "DETECT_STREAM_URL": "RTSP SUBSTREAM URL",
         "YOUTUBE_KEY": "STREAMING KEY",
         "WEBHOOK_URL": "DISCORD WEB HOOK URL",
         "MESSAGE":"⚠️ Motion detected by camera on Balcony at"},
     "Stairs": {
         "STREAM_URL": "RTSP URL",
+        "DETECT_STREAM_URL": "RTSP SUBSTREAM URL",
         "YOUTUBE_KEY": "STREAMING KEY",
         "WEBHOOK_URL": "DISCORD WEB HOOK URL",
         "MESSAGE": "⚠️ Motion detected by camera on Stairs at"},
     "Kitchen": {
         "STREAM_URL": "RTSP URL",
+        "DETECT_STREAM_URL": "RTSP SUBSTREAM URL",
         "YOUTUBE_KEY": "STREAMING KEY",
         "WEBHOOK_URL": "DISCORD WEB HOOK URL",
         "MESSAGE": "⚠️ Motion detetion by camera on Kitchen at"},
@@ -25,11 +31,47 @@ YOUTUBE = {
     "PLAYLIST_ID": 'PLAYLIST ID',
     "VIDEO_URL": 'https://www.youtube.com/watch?v=',
     "THUMBNAIL_PATH": 'PATH TO SAVE TMN',
+    "TOKEN_REFRESH_MARGIN": 600,  # Refresh the OAuth token this many seconds before it expires
+}
+
+# Thumbnail index: newest per camera in memory, files under THUMBNAIL_PATH/images, mirrored in Redis
+THUMBNAIL_STORE = {
+    "MAX_PER_CAMERA": 3,                    # Event thumbnails kept per camera
+    "MAX_TOTAL_BYTES": 50 * 1024 * 1024,    # Disk footprint cap across all cameras
+    "MAX_AGE": 3600,                        # Seconds before thumbnails and orphaned files are deleted
+}
+
+# Pre-provisioned broadcasts: one created-and-bound broadcast waits per camera
+BROADCAST_POOL = {
+    "ENABLED": True,
+    # Seconds before an unused broadcast is deleted and replaced. Replacing costs ~150 quota units
+    # (delete + insert + bind) of the 10k daily default, so keep it in days: a used broadcast gets
+    # its title and scheduledStartTime updated when it goes live, however old it is
+    "MAX_AGE": 7 * 24 * 3600,
+    "REFILL_INTERVAL": 30,      # Seconds between pool checks (a used entry refills right away)
+}
+
+# Discord alert dispatcher
+WEBHOOK = {
+    "QUEUE_SIZE": 100,          # Pending alerts; the oldest is dropped when full
+    "COALESCE_WINDOW": 1.0,     # Seconds to gather a burst into one message per webhook
+    "MAX_RETRIES": 5,
+    "TIMEOUT": 10,              # Seconds per HTTP request
 }
 
 REDIS = {
     "PORT" : 6379,
-    "HOST" : "localhost"
+    "HOST" : "localhost",
+    "MAX_CONNECTIONS": 20,          # Connection pool size shared by all threads
+    "STATE_TTL": 7 * 24 * 3600,     # Seconds before an untouched camera state hash expires
+}
+
+# Several detector processes/hosts split CAMERA_CONFIG through Redis leases (camera_leases.py)
+SHARDING = {
+    "ENABLED": False,
+    "WORKER_ID": None,          # None = "<hostname>-<pid>"
+    "LEASE_TTL": 15,            # Seconds a camera stays claimed without renewal (failover time)
+    "RENEW_INTERVAL": 5,        # Seconds between renewals / rebalancing; keep well below LEASE_TTL
 }
 
 LOG_DIR = "PATH"
@@ -37,6 +79,27 @@ FFMPEG_BIN = "PATH"
 HLS_ROOT_RAM_DISK="PATH"
 INDEX_M3U8="index.m3u8"
 
+# Where the YouTube push starts in the RAM-disk HLS playlist
+PRE_ROLL = {
+    "ENABLED": True,            # False = always start 30 segments back
+    "SECONDS": 10,              # Start this long before the detection (rounded to a segment boundary)
+}
+
+# In-process registry of running ffmpeg pushes (mirrored to Redis)
+FFMPEG_REGISTRY = {
+    "REAP_INTERVAL": 5,         # Seconds between checks for exited ffmpeg children
+}
+
+# ffmpeg push supervision (progress telemetry, stall detection, auto-restart)
+FFMPEG_SUPERVISOR = {
+    "STALL_TIMEOUT": 20,        # Seconds without progress before the push is restarted
+    "WATCH_INTERVAL": 2,        # Seconds between watchdog checks
+    "MAX_RESTARTS": 5,          # Restarts allowed within RESTART_WINDOW before giving up
+    "RESTART_WINDOW": 600,
+    "HEALTH_LOG_INTERVAL": 60,  # Seconds between fps/bitrate/speed log lines per stream
+    "RESTART_LIVE_START_INDEX": -2,  # Restarts resume this many segments from the live edge
+}
+
 
 # API CONFIGURATION
 MODEL = "yolo26x_int8_openvino_model"
@@ -67,12 +130,78 @@ TARGET_NAMES = {
     78: "hair drier", 79: "toothbrush"
 }
 TASK = "detect"
+
+# Batched front-model inference across cameras
+# MAX_BATCH_SIZE is also the batch the OpenVINO model is compiled for on first use
+FRONT_BATCH = {
+    "ENABLED": True,
+    "MAX_BATCH_SIZE": 8,        # Frames per predict call
+    "MAX_WAIT": 0.05,           # Upper bound on waiting for other running camera cycles; a lone frame is sent at once
+}
+
+# Back-model verification runs on its own worker instead of inside the camera thread
+BACK_VERIFICATION = {
+    "ASYNC": True,
+    "MAX_PENDING": 8,           # Candidate frames waiting for the back model (one per camera)
+}
+
+# Region-of-interest verification: the back model only sees crops around front hits
+ROI_VERIFY = {
+    "ENABLED": True,
+    "PADDING": 0.25,            # Grow each front box by this fraction of its size
+    "MIN_CROP_SIZE": 160,       # Pixels; small distant objects get context around them
+    "MAX_CROPS": 4,             # More regions than this -> verify the full frame
+    "MAX_AREA_RATIO": 0.6,      # Crops covering more of the frame than this -> verify the full frame
+}
+
+# Per-camera object tracker: skip back-model runs for objects already judged
+TRACKER = {
+    "ENABLED": True,
+    "IOU_THRESHOLD": 0.3,       # Minimum overlap for a detection to continue a track
+    "CHANGE_IOU": 0.5,          # Below this overlap with the judged box the track is verified again
+    "VERDICT_IOU": 0.3,         # Minimum overlap with an accepted back-model box for a track to count as verified
+    "TRACK_TTL": 30,            # Seconds an unseen track is kept
+    "VERDICT_TTL": 120,         # Seconds a verified/rejected verdict is trusted
+    "STOP_PERSISTENCE": 10,     # Stop streaming only when no track was seen for this long
+}
+
+# Adaptive per-camera check interval (per-camera overrides live in CAMERA_CONFIG)
+ADAPTIVE_INTERVAL = {
+    "ENABLED": True,
+    "MIN_INTERVAL": 1,          # Seconds; busiest a camera can be checked
+    "MAX_INTERVAL": 10,         # Seconds; slowest a quiet camera is checked
+    "SHRINK_FACTOR": 0.5,       # Applied after motion or a detection
+    "GROW_FACTOR": 1.5,         # Applied after each QUIET_PERIOD without activity
+    "QUIET_PERIOD": 120,
+}
+
+# Deadline scheduler for camera checks
+SCHEDULER = {
+    "MAX_WORKERS": 8,           # Camera cycles running at the same time
+    "MIN_DELAY": 0.1,           # Floor between two cycles of one camera (e.g. after a failed read)
+}
+
+# Stream start/stop (ffmpeg, YouTube API, Discord) run off the detection threads
+STREAM_ACTIONS = {
+    "MAX_WORKERS": 4,           # Cameras that can be starting or stopping at the same time
+}
+
+# Detection service (detection_service.py): one process owns the models, detectors send it frames
+# DETECT_ENDPOINT is where it listens; "?rtsp_url=<url>" runs detection on a grab from that stream
 DETECT_ENDPOINT = "http://127.0.0.1:8001/detect?rtsp_url="
+DETECTION_SERVICE = {
+    "REMOTE": False,            # True = YOLO26Gatekeeper sends frames to DETECT_ENDPOINT instead of loading models
+    "TIMEOUT": 10,              # Seconds per request (one batch of frames)
+    "JPEG_QUALITY": 90,         # Frames travel as JPEG
+    "BACK_MAX_WAIT": 0.05,      # Seconds the service waits to fill a back-model batch (front uses FRONT_BATCH)
+}
 
 
 # MOTION DETECTION CONFIGURATION
 # Optimized for 2-core CPU & Window recording
 MOTION_DETECTION = {
+    "ENABLED": True,            # Run the pixel-level motion gate before the YOLO front model
+    "METHOD": "KNN",            # KNN, MOG2 or AVERAGE (running average)
     "THRESHOLD": 200,           # Frame diff: 200 pixels (very sensitive for static cameras)
     "SENSITIVITY": 15,          # Pixel intensity delta (0-255) (was 20)
     "DOWNSCALE_WIDTH": 320,
@@ -82,4 +211,34 @@ MOTION_DETECTION = {
     "COOLDOWN_PERIOD": 60,      # Wait longer before stopping stream
     "LEARNING_RATE": 0.05,      # How fast the background model adapts (0.01 - 0.1)
     "KNN_WARMUP_FRAMES": 30,   # Frames to skip while KNN learns background
-}
\ No newline at end of file
+}
+
+# FRAME CAPTURE CONFIGURATION
+# Persistent mode keeps one decoder thread per camera with the newest frame buffered
+FRAME_CAPTURE = {
+    "PERSISTENT": True,         # False = open a new VideoCapture for every check
+    "RECONNECT_MIN_DELAY": 1,   # Seconds before the first reconnect attempt
+    "RECONNECT_MAX_DELAY": 30,  # Backoff cap between reconnect attempts
+    "MAX_FRAME_AGE": 5,         # Frames older than this are treated as missing
+    "PROCESS": False,           # Decode in one process per camera, frames shared through shared memory
+    "SHM_WIDTH": 640,           # Frame size of the shared ring (decoded frames are scaled to it);
+    "SHM_HEIGHT": 360,          # matching DECODE_WIDTH/HEIGHT lets keyframes be written straight into it
+    "SHM_SLOTS": 4,             # Frames per ring, at least 3
+    # Keyframes only: decode detection frames with ffmpeg (needs FFMPEG_BIN), one per GOP.
+    # Only for cameras whose keyframe interval (GOP) is well below MAX_FRAME_AGE, otherwise frames
+    # count as missing between keyframes. Every frame, including back-model crops and thumbnails,
+    # is then DECODE_WIDTH x DECODE_HEIGHT.
+    "KEYFRAMES_ONLY": False,
+    "DECODE_WIDTH": 640,        # Keyframes are scaled to this size by ffmpeg
+    "DECODE_HEIGHT": 360,
+    "HLS_READER": True,         # While streaming, decode the newest RAM-disk segment directly (inotify)
+    "HLS_POLL_INTERVAL": 0.5,   # Playlist polling when inotify is not available
+}
+
+# METRICS CONFIGURATION
+# Prometheus text format at http://HOST:PORT/metrics
+METRICS = {
+    "ENABLED": True,
+    "HOST": "127.0.0.1",        # Keep it local; put a reverse proxy in front to expose it
+    "PORT": 9108,
+}
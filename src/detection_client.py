@@ -0,0 +1,61 @@
+import threading
+import urllib.parse
+from collections import namedtuple
+import cv2
+import requests
+from config import DETECTION_SERVICE
+
+TIMEOUT = DETECTION_SERVICE.get("TIMEOUT", 10)
+JPEG_QUALITY = DETECTION_SERVICE.get("JPEG_QUALITY", 90)
+
+# Same attributes the gatekeeper reads from an Ultralytics result (len(boxes), box.cls, box.conf, box.xyxy[0])
+RemoteBox = namedtuple("RemoteBox", ["cls", "conf", "xyxy"])
+RemoteResult = namedtuple("RemoteResult", ["boxes"])
+
+
+def service_url(endpoint: str) -> str:
+    """DETECT_ENDPOINT without its query string, e.g. http://127.0.0.1:8001/detect."""
+    parts = urllib.parse.urlsplit(endpoint)
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def encode_frame(frame) -> bytes:
+    success, encoded = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    if not success:
+        raise Exception("Failed to encode frame")
+    return encoded.tobytes()
+
+
+def serialize_result(result) -> list:
+    """Ultralytics result -> [[cls, conf, x1, y1, x2, y2], ...] for the JSON response."""
+    return [[int(box.cls), float(box.conf), *map(float, box.xyxy[0])] for box in result.boxes]
+
+
+def deserialize_result(boxes) -> RemoteResult:
+    return RemoteResult([RemoteBox(cls, conf, [tuple(xyxy)]) for cls, conf, *xyxy in boxes])
+
+
+class DetectionClient:
+    """
+    HTTP client for detection_service.py.
+    One request carries every frame of a batch; each thread keeps its own keep-alive session.
+    """
+    def __init__(self, endpoint):
+        self.url = service_url(endpoint)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def predict(self, model: str, frames) -> list:
+        """Run the service's front or back model over frames; one result per frame."""
+        files = [("frame", (f"{index}.jpg", encode_frame(frame), "image/jpeg")) for index, frame in enumerate(frames)]
+        response = self._session().post(self.url, params={"model": model}, files=files, timeout=TIMEOUT)
+        response.raise_for_status()
+        results = response.json()["results"]
+        if len(results) != len(frames):
+            raise Exception(f"Detection service returned {len(results)} results for {len(frames)} frames")
+        return [deserialize_result(boxes) for boxes in results]
@@ -0,0 +1,98 @@
+"""
+Detection service: one process owns the OpenVINO models and serves every detector.
+
+    python detection_service.py
+    gunicorn -w 1 --threads 16 -b 127.0.0.1:8001 'detection_service:create_app()'
+
+Keep a single worker: the models are loaded once per process and requests from all
+clients are merged into batched predict calls.
+
+POST /detect?model=front|back   multipart "frame" fields (JPEG), one result list per frame
+GET  /detect?rtsp_url=<url>     grab a frame from the stream and run the front model on it
+"""
+import urllib.parse
+import cv2
+import numpy as np
+from flask import Flask, jsonify, request
+from config import DETECT_ENDPOINT, DETECTION_SERVICE, FRONT_BATCH, ROI_VERIFY
+from utils import print_message
+from batch_inference import BatchInferenceQueue
+from gatekeeper import YOLO26Gatekeeper, FRONT_MODEL_PATH, BACK_MODEL_PATH
+from detection_client import serialize_result
+
+
+def grab_frame(rtsp_url):
+    cap = cv2.VideoCapture(rtsp_url)
+    if not cap.isOpened():
+        return None
+    for _ in range(5):
+        cap.grab()
+    ret, frame = cap.read()
+    cap.release()
+    return frame if ret else None
+
+
+def decode_frame(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def create_app(gatekeeper=None):
+    gatekeeper = gatekeeper or YOLO26Gatekeeper(FRONT_MODEL_PATH, BACK_MODEL_PATH)
+    batchers = {
+        "front": gatekeeper.front_batcher or BatchInferenceQueue(
+            "front", gatekeeper.front_predict_batch,
+            max_batch_size=FRONT_BATCH.get("MAX_BATCH_SIZE", 8),
+            max_wait=FRONT_BATCH.get("MAX_WAIT", 0.05)),
+        "back": BatchInferenceQueue(
+            "back", gatekeeper.back_predict_batch,
+            max_batch_size=ROI_VERIFY.get("MAX_CROPS", 4),
+            max_wait=DETECTION_SERVICE.get("BACK_MAX_WAIT", 0.05)),
+    }
+
+    app = Flask(__name__)
+
+    @app.route("/detect", methods=["GET", "POST"])
+    def detect():
+        model = request.args.get("model", "front")
+        batcher = batchers.get(model)
+        if batcher is None:
+            return jsonify({"error": f"Unknown model '{model}'"}), 400
+
+        rtsp_url = request.args.get("rtsp_url")
+        if rtsp_url:
+            frame = grab_frame(rtsp_url)
+            if frame is None:
+                return jsonify({"error": "Could not read a frame from the stream"}), 502
+            frames = [frame]
+        else:
+            frames = [decode_frame(upload.read()) for upload in request.files.getlist("frame")]
+            if not frames:
+                return jsonify({"error": "No frames in request"}), 400
+            if any(frame is None for frame in frames):
+                return jsonify({"error": "Could not decode frame"}), 400
+
+        # Each frame joins whatever batch other clients are filling right now
+        futures = [batcher.submit(frame) for frame in frames]
+        try:
+            results = [serialize_result(future.result()) for future in futures]
+        except Exception as e:
+            print_message(f"Detection failed: {e}")
+            return jsonify({"error": str(e)}), 500
+        return jsonify({"model": model, "results": results})
+
+    @app.route("/health")
+    def health():
+        return jsonify({"status": "ok", "queued": {name: batcher.depth() for name, batcher in batchers.items()}})
+
+    return app
+
+
+def main():
+    endpoint = urllib.parse.urlsplit(DETECT_ENDPOINT)
+    app = create_app()
+    print_message(f"Detection service listening on {endpoint.hostname}:{endpoint.port}")
+    app.run(host=endpoint.hostname, port=endpoint.port or 80, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from config import CAMERA_CONFIG, FFMPEG_REGISTRY
+from utils import print_message
+from redis_utils import save_ffmpeg_pid_to_redis, get_ffmpeg_pid_from_redis, delete_ffmpeg_pid_from_redis
+
+REAP_INTERVAL = FFMPEG_REGISTRY.get("REAP_INTERVAL", 5)
+
+
+def pid_matches_camera(pid: int, camera_name: str) -> bool:
+    """True if pid is alive and is the ffmpeg pushing this camera's YouTube key (guards against PID reuse)."""
+    youtube_key = CAMERA_CONFIG[camera_name]["YOUTUBE_KEY"]
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read().decode(errors="ignore")
+    except OSError:
+        return False
+    return "ffmpeg" in cmdline and youtube_key in cmdline
+
+
+def wait_for_exit(pid: int, timeout: float) -> bool:
+    """Poll a process we did not start until it is gone."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+class FFmpegRegistry:
+    """
+    In-process registry of the ffmpeg push per camera (Popen handle, PID, start time).
+    Liveness checks and stops are dictionary lookups instead of `ps aux` scans.
+    PIDs are mirrored to Redis so a restarted detector can adopt streams it left running.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._adopt_checked = set()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def register(self, camera_name: str, process: subprocess.Popen) -> None:
+        started_at = time.time()
+        with self._lock:
+            self._entries[camera_name] = {"process": process, "pid": process.pid, "started_at": started_at}
+            self._adopt_checked.add(camera_name)
+            self._start_reaper()
+        try:
+            save_ffmpeg_pid_to_redis(camera_name, process.pid, started_at)
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not mirror ffmpeg PID to Redis: {e}")
+
+    def unregister(self, camera_name: str, entry=None) -> None:
+        """Forget the camera's ffmpeg; with entry given, only if it is still the registered one."""
+        with self._lock:
+            if entry is not None and self._entries.get(camera_name) is not entry:
+                return
+            self._entries.pop(camera_name, None)
+        try:
+            delete_ffmpeg_pid_from_redis(camera_name)
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not clear ffmpeg PID in Redis: {e}")
+
+    def _adopt(self, camera_name: str) -> None:
+        # Only the first lookup after a restart goes to Redis
+        with self._lock:
+            if camera_name in self._adopt_checked:
+                return
+        try:
+            saved = get_ffmpeg_pid_from_redis(camera_name)
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not read ffmpeg PID from Redis: {e}")
+            return
+        self.adopt_saved(camera_name, saved)
+
+    def adopt_saved(self, camera_name: str, saved) -> None:
+        """Adopt a (pid, started_at) read from Redis, e.g. by the bulk state load in main()."""
+        with self._lock:
+            if camera_name in self._adopt_checked:
+                return
+            self._adopt_checked.add(camera_name)
+        if not saved:
+            return
+
+        pid, started_at = saved
+        if not pid_matches_camera(pid, camera_name):
+            delete_ffmpeg_pid_from_redis(camera_name)
+            return
+        with self._lock:
+            self._entries.setdefault(camera_name, {"process": None, "pid": pid, "started_at": started_at})
+        print_message(f"[{camera_name}] Adopted running ffmpeg (PID: {pid})")
+
+    def _get(self, camera_name: str):
+        self._adopt(camera_name)
+        with self._lock:
+            return self._entries.get(camera_name)
+
+    def _alive(self, entry) -> bool:
+        process = entry["process"]
+        if process is not None:
+            return process.poll() is None
+        try:
+            os.kill(entry["pid"], 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def is_running(self, camera_name: str) -> bool:
+        entry = self._get(camera_name)
+        if entry is None:
+            return False
+        if self._alive(entry):
+            return True
+        self.unregister(camera_name, entry)
+        return False
+
+    def get_pid(self, camera_name: str):
+        """PID of the live ffmpeg for this camera, or None."""
+        if not self.is_running(camera_name):
+            return None
+        return self._get(camera_name)["pid"]
+
+    def terminate(self, camera_name: str, timeout: float) -> bool:
+        """SIGTERM, then SIGKILL after timeout. Returns True if ffmpeg exited gracefully."""
+        entry = self._get(camera_name)
+        if entry is None:
+            return True
+
+        graceful = True
+        process = entry["process"]
+        try:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    graceful = False
+                    process.kill()
+                    process.wait()
+            else:
+                os.kill(entry["pid"], signal.SIGTERM)
+                if not wait_for_exit(entry["pid"], timeout):
+                    graceful = False
+                    os.kill(entry["pid"], signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        finally:
+            self.unregister(camera_name, entry)
+        return graceful
+
+    def reap(self) -> None:
+        """Collect exited children so they never linger as zombies, and forget them."""
+        with self._lock:
+            entries = list(self._entries.items())
+        for camera_name, entry in entries:
+            if self._alive(entry):
+                continue
+            process = entry["process"]
+            code = process.returncode if process is not None else None
+            print_message(f"[{camera_name}] ffmpeg (PID: {entry['pid']}) exited with code {code}")
+            self.unregister(camera_name, entry)
+
+    def _start_reaper(self):
+        if self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="ffmpeg-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            try:
+                self.reap()
+            except Exception as e:
+                print_message(f"ffmpeg reaper failed: {e}")
+
+
+registry = FFmpegRegistry()
@@ -0,0 +1,233 @@
+import subprocess
+import threading
+import time
+from collections import deque
+from config import CAMERA_CONFIG, FFMPEG_BIN, INDEX_M3U8, HLS_ROOT_RAM_DISK, FFMPEG_SUPERVISOR
+from utils import print_message
+from ffmpeg_registry import registry as ffmpeg_registry
+from hls_reader import segment_index_for
+from metrics import (ffmpeg_fps, ffmpeg_bitrate_kbits, ffmpeg_speed, ffmpeg_drop_frames,
+                     ffmpeg_restarts, ffmpeg_seconds_since_progress)
+
+STALL_TIMEOUT = FFMPEG_SUPERVISOR.get("STALL_TIMEOUT", 20)
+WATCH_INTERVAL = FFMPEG_SUPERVISOR.get("WATCH_INTERVAL", 2)
+MAX_RESTARTS = FFMPEG_SUPERVISOR.get("MAX_RESTARTS", 5)
+RESTART_WINDOW = FFMPEG_SUPERVISOR.get("RESTART_WINDOW", 600)
+HEALTH_LOG_INTERVAL = FFMPEG_SUPERVISOR.get("HEALTH_LOG_INTERVAL", 60)
+RESTART_LIVE_START_INDEX = FFMPEG_SUPERVISOR.get("RESTART_LIVE_START_INDEX", -2)
+STDERR_LINES = 20
+DEFAULT_LIVE_START_INDEX = -30  # START POINT: 30 segments from the end
+
+
+def build_ffmpeg_command(camera_name: str, live_start_index: int = DEFAULT_LIVE_START_INDEX) -> list:
+    youtube_key = CAMERA_CONFIG[camera_name]["YOUTUBE_KEY"]
+    return [
+        FFMPEG_BIN,
+        '-nostats',
+        '-loglevel', 'warning',
+        '-progress', 'pipe:1',        # key=value progress blocks on stdout
+        '-re',                        # THROTTLE
+        '-live_start_index', str(live_start_index),
+        '-i', f'{HLS_ROOT_RAM_DISK}/{camera_name}/{INDEX_M3U8}',
+        '-c', 'copy',
+        '-f', 'flv',
+        f"rtmps://a.rtmp.youtube.com/live2/{youtube_key}"
+    ]
+
+
+def parse_progress_value(key: str, value: str):
+    """Turn ffmpeg -progress values (e.g. '2048.0kbits/s', '1.01x', 'N/A') into numbers where possible."""
+    value = value.strip()
+    if key == "bitrate" and value.endswith("kbits/s"):
+        value = value[:-len("kbits/s")]
+    elif key == "speed" and value.endswith("x"):
+        value = value[:-1]
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class FFmpegSupervisor:
+    """
+    Owns the ffmpeg push per camera: drains stdout/stderr so pipes never fill,
+    parses -progress output into per-camera metrics, and restarts a push that
+    exited or stalled near the live edge, keeping the YouTube broadcast.
+    """
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._watchdog = None
+
+    def launch(self, camera_name: str, live_start_index: int = DEFAULT_LIVE_START_INDEX,
+               replaces: dict | None = None) -> subprocess.Popen | None:
+        """
+        Start and register a push. With replaces (a restart), nothing is started unless that
+        stream is still the current one: the check, Popen and registration are one step under
+        the lock, so a concurrent release() either prevents the restart or sees the new process.
+        """
+        try:
+            # Where in the recording this push begins; with -re its position then advances in real time
+            start_time = segment_index_for(camera_name).start_time_at(live_start_index)
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not read HLS segment index: {e}")
+            start_time = None
+        with self._lock:
+            if replaces is not None and (self._streams.get(camera_name) is not replaces or replaces["stopping"]):
+                return None
+            process = subprocess.Popen(
+                build_ffmpeg_command(camera_name, live_start_index),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.DEVNULL,
+                start_new_session=True    # Decouple process from the terminal
+            )
+            now = time.time()
+            previous = self._streams.get(camera_name, {})
+            stream = {
+                "process": process,
+                "live_start_index": live_start_index,
+                "start_time": start_time,
+                "stopping": False,
+                "started_at": now,
+                "last_progress": now,
+                "restarts": previous.get("restarts", deque()),
+                "stderr": deque(maxlen=STDERR_LINES),
+                "metrics": {},
+                "last_health_log": now,
+            }
+            self._streams[camera_name] = stream
+            self._start_watchdog()
+            ffmpeg_registry.register(camera_name, process)
+        self._export(camera_name)
+
+        threading.Thread(target=self._read_progress, args=(camera_name, stream),
+                         name=f"ffmpeg-progress-{camera_name}", daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(stream,),
+                         name=f"ffmpeg-stderr-{camera_name}", daemon=True).start()
+        return process
+
+    def release(self, camera_name: str) -> None:
+        """Mark the push as intentionally stopped so the watchdog does not restart it."""
+        with self._lock:
+            stream = self._streams.pop(camera_name, None)
+        if stream is not None:
+            stream["stopping"] = True
+
+    def push_position(self, camera_name: str) -> float | None:
+        """Wall-clock time of the recording ffmpeg is pushing right now, or None if unknown."""
+        with self._lock:
+            stream = self._streams.get(camera_name)
+            if stream is None or stream["start_time"] is None:
+                return None
+            out_time_us = stream["metrics"].get("out_time_us")
+        if not isinstance(out_time_us, float):
+            return stream["start_time"]
+        return stream["start_time"] + out_time_us / 1_000_000
+
+    def _stat(self, camera_name: str, key: str) -> float:
+        """One value of the camera's push for the metrics endpoint; NaN when unknown or not streaming."""
+        with self._lock:
+            stream = self._streams.get(camera_name)
+            if stream is None:
+                return float("nan")
+            if key == "restarts":
+                return len(stream["restarts"])
+            if key == "seconds_since_progress":
+                return time.time() - stream["last_progress"]
+            value = stream["metrics"].get(key)
+        # ffmpeg reports 'N/A' until it has a value
+        return value if isinstance(value, float) else float("nan")
+
+    def _export(self, camera_name: str) -> None:
+        # Read at scrape time; registering again for the same camera just replaces the callbacks
+        for gauge, key in ((ffmpeg_fps, "fps"), (ffmpeg_bitrate_kbits, "bitrate"), (ffmpeg_speed, "speed"),
+                           (ffmpeg_drop_frames, "drop_frames"), (ffmpeg_restarts, "restarts"),
+                           (ffmpeg_seconds_since_progress, "seconds_since_progress")):
+            gauge.set_function(lambda key=key: self._stat(camera_name, key), camera=camera_name)
+
+    def _read_progress(self, camera_name, stream):
+        block = {}
+        for raw_line in stream["process"].stdout:
+            line = raw_line.decode(errors="ignore").strip()
+            key, sep, value = line.partition("=")
+            if not sep:
+                continue
+            block[key] = parse_progress_value(key, value)
+            if key != "progress":
+                continue
+
+            # One complete progress block: publish it
+            with self._lock:
+                previous_time = stream["metrics"].get("out_time_us")
+                stream["metrics"] = block
+                if block.get("out_time_us") != previous_time:
+                    stream["last_progress"] = time.time()
+            block = {}
+
+    def _read_stderr(self, stream):
+        for raw_line in stream["process"].stderr:
+            stream["stderr"].append(raw_line.decode(errors="ignore").rstrip())
+
+    def _start_watchdog(self):
+        if self._watchdog is not None:
+            return
+        self._watchdog = threading.Thread(target=self._watch_loop, name="ffmpeg-supervisor", daemon=True)
+        self._watchdog.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            with self._lock:
+                streams = list(self._streams.items())
+            for camera_name, stream in streams:
+                try:
+                    self._check(camera_name, stream)
+                except Exception as e:
+                    print_message(f"[{camera_name}] ffmpeg supervisor check failed: {e}")
+
+    def _check(self, camera_name, stream):
+        if stream["stopping"]:
+            return
+        now = time.time()
+        process = stream["process"]
+        exit_code = process.poll()
+
+        if exit_code is None and now - stream["last_progress"] <= STALL_TIMEOUT:
+            if now - stream["last_health_log"] >= HEALTH_LOG_INTERVAL:
+                stream["last_health_log"] = now
+                metrics = stream["metrics"]
+                print_message(
+                    f"[{camera_name}] Stream health: fps={metrics.get('fps')} bitrate={metrics.get('bitrate')}kbit/s "
+                    f"speed={metrics.get('speed')}x dropped={metrics.get('drop_frames')}")
+            return
+
+        if exit_code is None:
+            reason = f"no progress for {now - stream['last_progress']:.0f}s"
+            process.kill()
+            process.wait()
+        else:
+            reason = f"exited with code {exit_code}"
+        last_error = stream["stderr"][-1] if stream["stderr"] else ""
+        print_message(f"[{camera_name}] ffmpeg {reason}. {last_error}")
+
+        restarts = stream["restarts"]
+        while restarts and now - restarts[0] > RESTART_WINDOW:
+            restarts.popleft()
+        if len(restarts) >= MAX_RESTARTS:
+            print_message(f"[{camera_name}] ffmpeg restarted {len(restarts)} times in {RESTART_WINDOW}s, giving up.")
+            self.release(camera_name)
+            ffmpeg_registry.unregister(camera_name)
+            return
+
+        # Not the launch offset: that would rewind and re-upload segments the broadcast already has.
+        # The broadcast stays bound to the key, so resuming at the live edge only skips the gap.
+        process = self.launch(camera_name, RESTART_LIVE_START_INDEX, replaces=stream)
+        if process is None:
+            # A stop was requested while we were looking at it
+            return
+        restarts.append(now)
+        print_message(f"[{camera_name}] Restarted ffmpeg push (PID: {process.pid}).")
+
+
+supervisor = FFmpegSupervisor()
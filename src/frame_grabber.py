@@ -0,0 +1,199 @@
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+from config import FRAME_CAPTURE, FFMPEG_BIN
+from utils import print_message
+
+RECONNECT_MIN_DELAY = FRAME_CAPTURE.get("RECONNECT_MIN_DELAY", 1)
+RECONNECT_MAX_DELAY = FRAME_CAPTURE.get("RECONNECT_MAX_DELAY", 30)
+MAX_FRAME_AGE = FRAME_CAPTURE.get("MAX_FRAME_AGE", 5)
+KEYFRAMES_ONLY = FRAME_CAPTURE.get("KEYFRAMES_ONLY", False)
+DECODE_WIDTH = FRAME_CAPTURE.get("DECODE_WIDTH", 640)
+DECODE_HEIGHT = FRAME_CAPTURE.get("DECODE_HEIGHT", 360)
+
+
+class KeyframeCapture:
+    """
+    cv2.VideoCapture look-alike backed by an ffmpeg process that decodes keyframes only
+    (-skip_frame nokey) and scales them to DECODE_WIDTH x DECODE_HEIGHT before handing
+    raw BGR frames over a pipe. Detection samples one frame every few seconds, so the
+    P/B frames in between were decoded for nothing.
+    Frames arrive once per GOP, so the keyframe interval must stay below MAX_FRAME_AGE;
+    read() warns once if it does not.
+    """
+    def __init__(self, url, width=DECODE_WIDTH, height=DECODE_HEIGHT):
+        self.url = url
+        self.shape = (height, width, 3)
+        self.frame_size = width * height * 3
+        self._last_frame_at = None
+        self._gop_warned = False
+        command = [FFMPEG_BIN, '-nostdin', '-loglevel', 'error']
+        if url.startswith('rtsp'):
+            command += ['-rtsp_transport', 'tcp']
+        command += [
+            '-skip_frame', 'nokey',               # Decoder drops everything but keyframes
+            '-fflags', 'nobuffer', '-flags', 'low_delay',
+            '-i', url,
+            '-an',
+            '-vf', f'scale={width}:{height}',
+            '-vsync', '0',
+            '-pix_fmt', 'bgr24',
+            '-f', 'rawvideo',
+            'pipe:1'
+        ]
+        try:
+            self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            print_message(f"Could not start ffmpeg decoder: {e}")
+            self._process = None
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def read(self, image=None):
+        """Read the next keyframe, into image when it has the right shape (e.g. a shared memory slot)."""
+        if self._process is None:
+            return False, None
+        if image is None or image.shape != self.shape or image.dtype != np.uint8 or not image.flags.c_contiguous:
+            image = np.empty(self.shape, dtype=np.uint8)
+        view = memoryview(image).cast("B")
+        received = 0
+        while received < self.frame_size:
+            count = self._process.stdout.readinto(view[received:])
+            if not count:
+                return False, None
+            received += count
+        self._check_interval()
+        return True, image
+
+    def _check_interval(self):
+        now = time.monotonic()
+        if self._last_frame_at is not None and not self._gop_warned and now - self._last_frame_at > MAX_FRAME_AGE:
+            self._gop_warned = True
+            print_message(f"Keyframes from {self.url} are {now - self._last_frame_at:.1f}s apart, more than "
+                          f"MAX_FRAME_AGE ({MAX_FRAME_AGE}s): frames will be dropped as stale. "
+                          f"Shorten the camera's GOP or turn KEYFRAMES_ONLY off.")
+        self._last_frame_at = now
+
+    def release(self):
+        if self._process is None:
+            return
+        self._process.kill()
+        self._process.wait()
+        self._process.stdout.close()
+        self._process = None
+
+
+def open_capture(url):
+    """Decoder for detection sampling: keyframe-only ffmpeg, or a plain VideoCapture."""
+    if KEYFRAMES_ONLY:
+        return KeyframeCapture(url)
+    cap = cv2.VideoCapture(url)
+    # Keep the driver-side queue as short as possible so we always decode the live edge
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class FrameGrabber:
+    """
+    Long-lived decoder thread for one camera.
+    Keeps the RTSP session (or HLS playlist) open and holds only the newest frame,
+    so readers never pay the connect / codec init / keyframe wait themselves.
+    """
+    def __init__(self, camera_name, url):
+        self.camera_name = camera_name
+        self.url = url
+        self.last_reconnect_time = 0
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+        self._frame = None
+        self._frame_time = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._capture_loop, name=f"grabber-{self.camera_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def set_source(self, url):
+        """Switch to another URL (RTSP <-> HLS); the capture thread reconnects on its next read."""
+        if url == self.url:
+            return
+        with self._lock:
+            self.url = url
+            self._frame = None
+            self._frame_time = 0
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+
+    def read(self):
+        """Return the newest decoded frame, or None if there is no recent one."""
+        with self._lock:
+            frame, frame_time = self._frame, self._frame_time
+        if frame is None or time.time() - frame_time > MAX_FRAME_AGE:
+            return None
+        return frame
+
+    def _open_capture(self, url):
+        return open_capture(url)
+
+    def _decode(self, cap):
+        return cap.read()
+
+    def _publish(self, frame, cap_url):
+        with self._lock:
+            # Drop the frame if the source was switched while we were decoding
+            if cap_url == self.url:
+                self._frame = frame
+                self._frame_time = time.time()
+
+    def _wait_before_reconnect(self):
+        # Exponential backoff between attempts, measured from the last reconnect
+        wait = self.last_reconnect_time + self._reconnect_delay - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        self._reconnect_delay = min(self._reconnect_delay * 2, RECONNECT_MAX_DELAY)
+
+    def _capture_loop(self):
+        cap = None
+        cap_url = None
+        while self._running:
+            url = self.url
+            if cap is None or cap_url != url:
+                if cap is not None:
+                    cap.release()
+                    cap = None
+                if self.last_reconnect_time:
+                    self._wait_before_reconnect()
+                self.last_reconnect_time = time.time()
+                cap = self._open_capture(url)
+                cap_url = url
+                if not cap.isOpened():
+                    print_message(f"[{self.camera_name}] Could not open capture, retrying in {self._reconnect_delay}s")
+                    cap.release()
+                    cap = None
+                    continue
+
+            ret, frame = self._decode(cap)
+            if not ret or frame is None:
+                print_message(f"[{self.camera_name}] Capture lost, reconnecting...")
+                cap.release()
+                cap = None
+                continue
+
+            self._reconnect_delay = RECONNECT_MIN_DELAY
+            self._publish(frame, cap_url)
+
+        if cap is not None:
+            cap.release()
@@ -0,0 +1,181 @@
+import cv2
+import os
+import threading
+from collections import namedtuple
+from ultralytics import YOLO
+from config import FRONT_MODEL, BACK_MODEL, FRONT_DETECT_CONF, BACK_DETECT_CONF, IMAGE_SIZE, TARGET_ACTIVATION, DEVICE_TYPE, TARGET_NAMES, TASK, FRONT_BATCH, ROI_VERIFY, TRACKER
+from utils import print_message, encode_thumbnail, draw_detect_objectcv
+from thumbnails import put_thumbnail
+from batch_inference import BatchInferenceQueue
+from roi import crop_regions
+from tracker import ObjectTracker
+from detection_client import DetectionClient
+from metrics import inference_seconds, inference_batch_size, detections_total
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONT_MODEL_PATH = os.path.join(BASE_DIR, "models", FRONT_MODEL)
+BACK_MODEL_PATH = os.path.join(BASE_DIR, "models", BACK_MODEL)
+
+# One front/back model hit: class id, readable label, confidence and (x1, y1, x2, y2) in frame pixels
+Detection = namedtuple("Detection", ["cls_id", "label", "conf", "xyxy"])
+
+
+class YOLO26Gatekeeper:
+    """
+    A shared AI engine to prevent loading the model multiple times.
+    With remote_url set, the models live in detection_service.py and predict calls go over HTTP.
+    """
+    def __init__(self, front_model_path, back_model_path, remote_url=None):
+        self.remote = None
+        self.front_model = self.back_model = None
+        if remote_url:
+            self.remote = DetectionClient(remote_url)
+            print_message(f"Using detection service at {remote_url}")
+        else:
+            # Load the OpenVINO model specifically for Intel CPU
+            self.front_model = YOLO(front_model_path, task=TASK)
+            self.back_model = YOLO(back_model_path, task=TASK)
+
+        # Per-camera trackers remember what the back model already accepted or rejected
+        self.trackers = {}
+        self._trackers_lock = threading.Lock()
+
+        # Frames from all cameras due in the same cycle share one front predict call
+        self.front_batcher = None
+        if FRONT_BATCH.get('ENABLED', True):
+            self.front_batcher = BatchInferenceQueue(
+                "front",
+                self.front_predict_batch,
+                max_batch_size=FRONT_BATCH.get('MAX_BATCH_SIZE', 8),
+                max_wait=FRONT_BATCH.get('MAX_WAIT', 0.05)
+            )
+
+    def tracker_for(self, camera_name):
+        with self._trackers_lock:
+            if camera_name not in self.trackers:
+                self.trackers[camera_name] = ObjectTracker()
+            return self.trackers[camera_name]
+
+    def front_predict_batch(self, frames):
+        """Run the 320p front model once over a list of frames, one result per frame."""
+        inference_batch_size.observe(len(frames), model="front")
+        with inference_seconds.time(model="front"):
+            if self.remote is not None:
+                return self.remote.predict("front", frames)
+            results = self.front_model.predict(
+                source=frames,
+                imgsz='320',
+                classes=TARGET_ACTIVATION,
+                conf=FRONT_DETECT_CONF,
+                verbose=False,
+                device=DEVICE_TYPE,
+                batch=FRONT_BATCH.get('MAX_BATCH_SIZE', 8)
+            )
+            return list(results)
+
+    def front_has_targets(self, frame, camera_name):
+        if frame is None: return False
+
+        if self.front_batcher is not None:
+            results = [self.front_batcher.predict(frame)]
+        elif self.remote is not None:
+            results = self.front_predict_batch([frame])
+        else:
+            with inference_seconds.time(model="front"):
+                results = self.front_model.predict(
+                    source=frame,
+                    imgsz='320',
+                    classes=TARGET_ACTIVATION,
+                    conf=FRONT_DETECT_CONF,
+                    verbose=False,
+                    device=DEVICE_TYPE
+                )
+
+        correct_targets = []
+        for result in results:
+            if len(result.boxes) == 0:
+                continue
+
+            for box in result.boxes:
+                conf = float(box.conf)
+                cls_id = int(box.cls)
+                label = TARGET_NAMES.get(cls_id, "Unknown")
+                detect_message = f"{label} ({conf:.2f})"
+                print_message(f"[{camera_name}] Front Detected: {detect_message}")
+                correct_targets.append(Detection(cls_id, label, conf, tuple(map(float, box.xyxy[0]))))
+
+        if correct_targets:
+            detections_total.inc(len(correct_targets), camera=camera_name, model="front")
+        return correct_targets
+
+    def back_predict_batch(self, frames):
+        """Run the 640p back model over full frames or crops, one result per input."""
+        inference_batch_size.observe(len(frames), model="back")
+        with inference_seconds.time(model="back"):
+            if self.remote is not None:
+                return self.remote.predict("back", frames)
+            results = self.back_model.predict(
+                source=frames,
+                device=DEVICE_TYPE,
+                classes=list(TARGET_NAMES.keys()),
+                conf=BACK_DETECT_CONF,
+                imgsz=IMAGE_SIZE,
+                verbose=False,
+                batch=ROI_VERIFY.get('MAX_CROPS', 4)
+            )
+            return list(results)
+
+    def back_has_targets(self, frame, camera_name, front_targets=None):
+        """(target detections or None, thumbnail event ID or None) for one candidate frame."""
+        # Crop-verify: only the padded regions around front hits go to the back model
+        regions = None
+        if front_targets and ROI_VERIFY.get('ENABLED', True):
+            regions = crop_regions(frame, [target.xyxy for target in front_targets])
+        if not regions:
+            regions = [(0, 0, frame)]
+
+        results = self.back_predict_batch([crop for _, _, crop in regions])
+
+        target_detections = []
+        accepted_boxes = []
+        annotated = None
+
+        # 3. Process results silently
+        for (x_offset, y_offset, _), result in zip(regions, results):
+            if len(result.boxes) == 0:
+                continue
+
+            for box in result.boxes:
+                conf = float(box.conf)
+                cls_id = int(box.cls)
+                label = TARGET_NAMES.get(cls_id, "Unknown")
+                detect_message = f"{label} ({conf:.2f})"
+                print_message(f"[{camera_name}] Back Detected: {detect_message}")
+
+                if cls_id not in TARGET_ACTIVATION:
+                    continue
+                # Map crop coordinates back to the full frame
+                x1, y1, x2, y2 = map(float, box.xyxy[0])
+                xyxy = (x1 + x_offset, y1 + y_offset, x2 + x_offset, y2 + y_offset)
+                if annotated is None:
+                    # Draw on a copy: the capture thread may hand the same frame to other readers
+                    annotated = frame.copy()
+                draw_detect_objectcv(cv2, xyxy, annotated, label, conf)
+                target_detections.append(detect_message)
+                accepted_boxes.append((xyxy, detect_message))
+
+        # One thumbnail per event with every box on it; the event ID follows the stream start to set_thumbnail
+        event_id = None
+        if annotated is not None:
+            try:
+                event_id = put_thumbnail(camera_name, encode_thumbnail(cv2, annotated))
+            except Exception as e:
+                print_message(f"[{camera_name}] Could not encode thumbnail: {e}")
+
+        if front_targets and TRACKER.get('ENABLED', True):
+            self.tracker_for(camera_name).record_verdict(front_targets, frame.shape, accepted_boxes, event_id)
+
+        if target_detections:
+            detections_total.inc(len(target_detections), camera=camera_name, model="back")
+
+        return (target_detections if target_detections else None), event_id
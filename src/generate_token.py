@@ -1,8 +1,14 @@
 import os
 import pickle
+import threading
+import datetime
+import time
+import httplib2
+import google_auth_httplib2
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 from config import YOUTUBE
 from utils import print_message
 
@@ -13,16 +19,30 @@ CLIENT_SECRETS_FILE = YOUTUBE["CLIENT_SECRETS_FILE"]
 API_SERVICE_NAME = YOUTUBE["API_SERVICE_NAME"]
 API_VERSION = YOUTUBE["API_VERSION"]
 TOKEN_FILE = YOUTUBE["TOKEN_FILE"]
+TOKEN_REFRESH_MARGIN = YOUTUBE.get("TOKEN_REFRESH_MARGIN", 600)  # Refresh this many seconds before expiry
+
+# Process-wide client: built once from the bundled discovery document
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+_refresh_thread = None
+# One authorized connection per thread, reused across that thread's requests
+_thread_http = threading.local()
 
 
 def save_token(credentials):
-    with open(TOKEN_FILE, 'wb') as token:
+    # Write to a temp file and rename, so a crash never leaves a truncated token
+    tmp_file = f"{TOKEN_FILE}.tmp"
+    with open(tmp_file, 'wb') as token:
         pickle.dump(credentials, token)
+        token.flush()
+        os.fsync(token.fileno())
+    os.replace(tmp_file, TOKEN_FILE)
 
 
-def get_authenticated_service():
+def load_credentials():
     """
-    Authenticates the user and returns a YouTube service object.
+    Authenticates the user and returns the OAuth credentials.
     It manages the token.json file automatically after the first run.
     Uses run_local_server with specific messages for headless operation.
     """
@@ -42,6 +62,7 @@ def get_authenticated_service():
 
         try:
             credentials = flow.run_local_server(port=0, open_browser=False)
+            save_token(credentials)
         except Exception as e:
             print_message(
                 f"\nCould not run local server for auth. Ensure you have a GUI browser available if running locally.\nError: {e}")
@@ -54,7 +75,82 @@ def get_authenticated_service():
             credentials = flow.credentials
             save_token(credentials)
 
-    return build(API_SERVICE_NAME, API_VERSION, credentials=credentials)
+    return credentials
+
+
+def seconds_until_expiry(credentials) -> float | None:
+    """Seconds left on the access token, or None if it has no expiry."""
+    expiry = credentials.expiry
+    if expiry is None:
+        return None
+    # google-auth keeps expiry as a naive UTC datetime
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=datetime.timezone.utc)
+    return (expiry - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+
+def refresh_credentials(credentials, force=False) -> bool:
+    """Refresh the token if it expires within TOKEN_REFRESH_MARGIN and persist it. Returns True if refreshed."""
+    if not credentials.refresh_token:
+        return False
+    remaining = seconds_until_expiry(credentials)
+    if not force and credentials.valid and remaining is not None and remaining > TOKEN_REFRESH_MARGIN:
+        return False
+
+    credentials.refresh(Request())
+    save_token(credentials)
+    print_message("YouTube token refreshed.")
+    return True
+
+
+def _token_refresh_loop():
+    while True:
+        try:
+            refresh_credentials(_credentials)
+        except Exception as e:
+            print_message(f"Could not refresh YouTube token: {e}")
+        remaining = seconds_until_expiry(_credentials)
+        wait = TOKEN_REFRESH_MARGIN if remaining is None else remaining - TOKEN_REFRESH_MARGIN
+        # Wake up just before the margin is reached, but retry failures soon
+        time.sleep(min(max(wait, 30), TOKEN_REFRESH_MARGIN))
+
+
+def _build_request(http, *args, **kwargs):
+    # httplib2.Http is not thread-safe: each thread gets its own keep-alive authorized connection
+    authorized_http = getattr(_thread_http, "http", None)
+    if authorized_http is None:
+        authorized_http = google_auth_httplib2.AuthorizedHttp(_credentials, http=httplib2.Http())
+        _thread_http.http = authorized_http
+    return HttpRequest(authorized_http, *args, **kwargs)
+
+
+def get_authenticated_service():
+    """
+    Returns the shared YouTube service object.
+    The first call loads the token, refreshes it if needed and builds the client
+    from the static discovery document; a background thread keeps the token fresh.
+    """
+    global _service, _credentials, _refresh_thread
+    if _service is not None:
+        return _service
+
+    with _service_lock:
+        if _service is not None:
+            return _service
+
+        _credentials = load_credentials()
+        refresh_credentials(_credentials)
+        _service = build(
+            API_SERVICE_NAME,
+            API_VERSION,
+            http=google_auth_httplib2.AuthorizedHttp(_credentials, http=httplib2.Http()),
+            requestBuilder=_build_request,
+            static_discovery=True
+        )
+
+        _refresh_thread = threading.Thread(target=_token_refresh_loop, name="youtube-token", daemon=True)
+        _refresh_thread.start()
+    return _service
 
 
 if __name__ == '__main__':
@@ -0,0 +1,297 @@
+import ctypes
+import ctypes.util
+import datetime
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+import cv2
+from config import FRAME_CAPTURE, HLS_ROOT_RAM_DISK, INDEX_M3U8
+from utils import print_message
+
+POLL_INTERVAL = FRAME_CAPTURE.get("HLS_POLL_INTERVAL", 0.5)
+MAX_FRAME_AGE = FRAME_CAPTURE.get("MAX_FRAME_AGE", 5)
+
+# <linux/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_IGNORED = 0x00008000  # Watch removed, e.g. the directory was deleted
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# program_date_time: wall-clock start (epoch seconds) from #EXT-X-PROGRAM-DATE-TIME, or None
+HLSSegment = namedtuple("HLSSegment", ["uri", "duration", "program_date_time"])
+# A segment placed on the wall clock
+IndexedSegment = namedtuple("IndexedSegment", ["uri", "start", "end"])
+
+
+def parse_program_date_time(value):
+    try:
+        return datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_playlist(text):
+    """Media segments of an HLS playlist, oldest first."""
+    segments, duration, program_date_time = [], None, None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line.startswith("#EXT-X-PROGRAM-DATE-TIME:"):
+            program_date_time = parse_program_date_time(line[len("#EXT-X-PROGRAM-DATE-TIME:"):])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append(HLSSegment(line, duration, program_date_time))
+            # The tag applies to one segment; later ones follow on from it
+            program_date_time = program_date_time + duration if program_date_time is not None else None
+            duration = None
+    return segments
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+class DirectoryWatcher:
+    """
+    Tells whether anything was written or renamed into a directory since the last call.
+    Uses a non-blocking inotify descriptor when available (drained on demand, no thread)
+    and falls back to polling a file's mtime.
+    """
+    def __init__(self, directory, poll_file):
+        self.directory = directory
+        self.poll_file = poll_file
+        self._fd = None
+        self._last_mtime = None
+        self._last_poll = 0
+
+    def _watch(self):
+        if self._fd is not None or _libc is None or not os.path.isdir(self.directory):
+            return
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        if _libc.inotify_add_watch(fd, os.fsencode(self.directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            print_message(f"inotify unavailable for {self.directory} (errno {ctypes.get_errno()}), polling instead")
+            os.close(fd)
+            return
+        self._fd = fd
+
+    def _drain(self) -> bool:
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size + name_length
+                changed = True
+                if mask & IN_IGNORED:
+                    # The recorder recreated the directory: the watch is dead, let _watch() arm a new one
+                    self.close()
+                    return True
+
+    def _poll(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_poll < POLL_INTERVAL:
+            return False
+        self._last_poll = now
+        try:
+            mtime = os.stat(self.poll_file).st_mtime_ns
+        except OSError:
+            return False
+        changed, self._last_mtime = mtime != self._last_mtime, mtime
+        return changed
+
+    def changed(self) -> bool:
+        self._watch()
+        if self._fd is not None:
+            return self._drain()
+        return self._poll()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class HLSSegmentReader:
+    """
+    Frame source for a camera while it streams: reads the RAM-disk HLS segments directly.
+    Follows the position ffmpeg is pushing (position() returns its wall-clock time), so stop
+    decisions match what viewers see; without one it stays a segment behind the live edge.
+    Each read seeks to that offset in its segment and decodes a single frame.
+    """
+    def __init__(self, camera_name, playlist_path, position=None):
+        self.camera_name = camera_name
+        self.playlist_path = playlist_path
+        self.directory = os.path.dirname(playlist_path)
+        self.index = segment_index_for(camera_name, playlist_path)
+        self.position = position
+        self._cap = None
+        self._segment = None
+        # close() comes from the stream action thread when the stream stops
+        self._lock = threading.Lock()
+
+    def _open(self, segment):
+        self._release()
+        cap = cv2.VideoCapture(os.path.join(self.directory, segment.uri))
+        if not cap.isOpened():
+            cap.release()
+            return
+        self._cap = cap
+        self._segment = segment
+
+    def read(self):
+        """Frame at the pushed (or near-live) position, or None if the recorder stopped producing segments."""
+        with self._lock:
+            return self._read()
+
+    def _target_time(self):
+        position = self.position() if self.position is not None else None
+        if position is not None:
+            return position
+        newest = self.index.newest()
+        return None if newest is None else time.time() - (newest.end - newest.start)
+
+    def _read(self):
+        target = self._target_time()
+        if target is None:
+            return None
+        segment = self.index.segment_at(target)
+        # Past the newest segment for longer than a fresh frame may be old: the recorder stalled
+        if segment is None or target > segment.end + MAX_FRAME_AGE:
+            return None
+        if segment.uri != (self._segment.uri if self._segment is not None else None):
+            self._open(segment)
+        if self._cap is None:
+            return None
+
+        offset_ms = min(max(target - segment.start, 0), segment.end - segment.start) * 1000
+        # The decoder seeks to the keyframe before the offset and decodes up to it
+        self._cap.set(cv2.CAP_PROP_POS_MSEC, offset_ms)
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def close(self):
+        """Drop the open segment (e.g. when the stream stops); the shared index stays."""
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+        self._cap = None
+        self._segment = None
+
+
+class SegmentIndex:
+    """
+    Wall-clock index of one camera's RAM-disk HLS playlist.
+    Segment times come from #EXT-X-PROGRAM-DATE-TIME when the recorder writes it, otherwise
+    from the segment file's mtime (the moment it was finished). The playlist is re-read
+    only when the directory changed, and each segment is stat'ed once.
+    """
+    def __init__(self, playlist_path):
+        self.playlist_path = playlist_path
+        self.directory = os.path.dirname(playlist_path)
+        self.watcher = DirectoryWatcher(self.directory, playlist_path)
+        self.segments = []
+        self._known = {}
+        self._lock = threading.Lock()
+
+    def _place(self, segment):
+        if segment.program_date_time is not None:
+            return IndexedSegment(segment.uri, segment.program_date_time, segment.program_date_time + segment.duration)
+        placed = self._known.get(segment.uri)
+        if placed is None:
+            end = os.stat(os.path.join(self.directory, segment.uri)).st_mtime
+            placed = IndexedSegment(segment.uri, end - segment.duration, end)
+        return placed
+
+    def refresh(self):
+        if not self.watcher.changed() and self.segments:
+            return
+        try:
+            with open(self.playlist_path) as f:
+                segments = parse_playlist(f.read())
+        except OSError:
+            return
+        indexed = []
+        for segment in segments:
+            try:
+                indexed.append(self._place(segment))
+            except OSError:
+                # Deleted by the recorder between the playlist write and now
+                continue
+        self.segments = indexed
+        self._known = {segment.uri: segment for segment in indexed}
+
+    def newest(self):
+        with self._lock:
+            self.refresh()
+            return self.segments[-1] if self.segments else None
+
+    def segment_at(self, wall_time):
+        """Segment holding wall_time; the first or last one when outside the playlist, None when empty."""
+        with self._lock:
+            self.refresh()
+            segments = self.segments
+        if not segments:
+            return None
+        for segment in segments:
+            if segment.end > wall_time:
+                return segment
+        return segments[-1]
+
+    def start_time_at(self, live_start_index):
+        """Wall-clock start of the segment ffmpeg -live_start_index would begin with, or None."""
+        with self._lock:
+            self.refresh()
+            segments = self.segments
+        if not segments:
+            return None
+        return segments[max(live_start_index, -len(segments))].start
+
+    def live_start_index(self, wall_time):
+        """
+        Negative playlist index (for ffmpeg -live_start_index) of the segment holding wall_time.
+        Older than the playlist: its first segment. None when the playlist is unavailable.
+        """
+        with self._lock:
+            self.refresh()
+            segments = self.segments
+        if not segments:
+            return None
+        for position, segment in enumerate(segments):
+            if segment.end > wall_time:
+                return position - len(segments)
+        return -1
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def segment_index_for(camera_name: str, playlist_path: str | None = None) -> SegmentIndex:
+    """The camera's shared index (pre-roll, push position and the streaming-mode reader)."""
+    with _indexes_lock:
+        if camera_name not in _indexes:
+            _indexes[camera_name] = SegmentIndex(
+                playlist_path or os.path.join(HLS_ROOT_RAM_DISK, camera_name, INDEX_M3U8))
+        return _indexes[camera_name]
@@ -0,0 +1,239 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS
+from utils import print_message
+
+# Latency buckets in seconds: from a fast motion check up to a go_live retry loop
+DEFAULT_BUCKETS = METRICS.get("BUCKETS", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. alerts sent or streams started."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    """Current value; either set directly or read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function, **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                print_message(f"Metric {self.name} callback failed: {e}")
+        # Prometheus spells it NaN
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {'NaN' if value != value else value}"
+                for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """Latency distribution with cumulative buckets, as Prometheus expects."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """Decorator form of time() for helpers whose labels are fixed."""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _samples(self):
+        with self._lock:
+            series = {key: (list(s["counts"]), s["sum"]) for key, s in self._series.items()}
+        lines = []
+        for key, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- Detection pipeline ---
+cycle_stage_seconds = registry.register(Histogram(
+    "camera_cycle_stage_seconds", "Time spent in each stage of CameraWorker.run_cycle.", ("camera", "stage")))
+cycle_seconds = registry.register(Histogram(
+    "camera_cycle_seconds", "Wall time of one CameraWorker.run_cycle.", ("camera",)))
+inference_seconds = registry.register(Histogram(
+    "model_inference_seconds", "Time of one predict call of the front or back model.", ("model",)))
+inference_batch_size = registry.register(Histogram(
+    "model_inference_batch_size", "Frames or crops per predict call.", ("model",), buckets=(1, 2, 4, 8, 16, 32)))
+detections_total = registry.register(Counter(
+    "model_detections_total", "Target detections per camera and model.", ("camera", "model")))
+check_interval_seconds = registry.register(Gauge(
+    "camera_check_interval_seconds", "Current adaptive AI check interval.", ("camera",)))
+frames_missing_total = registry.register(Counter(
+    "camera_frames_missing_total", "Cycles that found no fresh frame.", ("camera",)))
+
+# --- Streaming ---
+stream_action_seconds = registry.register(Histogram(
+    "stream_action_seconds", "Time of start_ffmpeg_stream / stop_ffmpeg_stream.", ("camera", "action")))
+stream_actions_total = registry.register(Counter(
+    "stream_actions_total", "Stream start/stop outcomes.", ("camera", "action", "result")))
+streaming_cameras = registry.register(Gauge(
+    "streaming_cameras", "Cameras currently starting or live."))
+ffmpeg_fps = registry.register(Gauge(
+    "ffmpeg_stream_fps", "Frames per second of the ffmpeg push (NaN when not streaming).", ("camera",)))
+ffmpeg_bitrate_kbits = registry.register(Gauge(
+    "ffmpeg_stream_bitrate_kbits", "Output bitrate of the ffmpeg push in kbit/s.", ("camera",)))
+ffmpeg_speed = registry.register(Gauge(
+    "ffmpeg_stream_speed", "Push speed relative to real time (1.0 = keeping up).", ("camera",)))
+ffmpeg_drop_frames = registry.register(Gauge(
+    "ffmpeg_stream_drop_frames", "Frames dropped by the current ffmpeg push.", ("camera",)))
+ffmpeg_restarts = registry.register(Gauge(
+    "ffmpeg_stream_restarts", "Supervisor restarts within the restart window.", ("camera",)))
+ffmpeg_seconds_since_progress = registry.register(Gauge(
+    "ffmpeg_stream_seconds_since_progress", "Seconds since the push last advanced.", ("camera",)))
+youtube_call_seconds = registry.register(Histogram(
+    "youtube_call_seconds", "Time of YouTube Data API helpers.", ("call",)))
+
+# --- Alerts and queues ---
+webhook_post_seconds = registry.register(Histogram(
+    "webhook_post_seconds", "Time to deliver one Discord message, retries included."))
+webhook_messages_total = registry.register(Counter(
+    "webhook_messages_total", "Discord messages by outcome.", ("result",)))
+queue_depth = registry.register(Gauge(
+    "queue_depth", "Items waiting in an internal queue.", ("queue",)))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the log
+        pass
+
+
+def start_metrics_server():
+    """Serve /metrics in Prometheus text format on a daemon thread; no-op when disabled."""
+    if not METRICS.get("ENABLED", True):
+        return None
+    host, port = METRICS.get("HOST", "127.0.0.1"), METRICS.get("PORT", 9108)
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print_message(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print_message(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -1,165 +1,372 @@
-import cv2
 import time
-import os
-from ultralytics import YOLO
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from config import CAMERA_CONFIG, MOTION_DETECTION, FRONT_MODEL, BACK_MODEL, FRONT_DETECT_CONF, BACK_DETECT_CONF, IMAGE_SIZE, TARGET_ACTIVATION, DEVICE_TYPE, TARGET_NAMES, HLS_ROOT_RAM_DISK, INDEX_M3U8
-from utils import print_message, save_picture, draw_detect_objectcv
-from start_stream import start_ffmpeg_stream
-from stop_stream import stop_ffmpeg_stream
+from config import CAMERA_CONFIG, MOTION_DETECTION, HLS_ROOT_RAM_DISK, INDEX_M3U8, FRAME_CAPTURE, BACK_VERIFICATION, SCHEDULER, STREAM_ACTIONS, TRACKER, ADAPTIVE_INTERVAL, DETECT_ENDPOINT, DETECTION_SERVICE, SHARDING
+from utils import print_message
+from gatekeeper import YOLO26Gatekeeper, FRONT_MODEL_PATH, BACK_MODEL_PATH
+from frame_grabber import FrameGrabber, open_capture, KEYFRAMES_ONLY
+from shm_frames import SharedFrameSource
+from hls_reader import HLSSegmentReader
+from ffmpeg_supervisor import supervisor as ffmpeg_supervisor
+from motion_gate import MotionGate
+from verification_queue import VerificationQueue
+from scheduler import CameraScheduler
+from stream_actions import StreamController, IDLE
+from broadcast_pool import start_broadcast_pool, add_broadcast_pool_camera, remove_broadcast_pool_camera
+from camera_leases import LeaseManager, RENEW_INTERVAL
+from generate_token import get_authenticated_service
+from webhook import get_dispatcher
+from redis_utils import load_camera_states_from_redis
+from metrics import cycle_stage_seconds, cycle_seconds, check_interval_seconds, frames_missing_total, streaming_cameras, queue_depth, start_metrics_server
 
 # --- CONFIGURATION ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FRONT_MODEL_PATH = os.path.join(BASE_DIR, "models", FRONT_MODEL)
-BACK_MODEL_PATH = os.path.join(BASE_DIR, "models", BACK_MODEL)
-CHECK_INTERVAL = 3  # Seconds between AI checks per camera
-
-class YOLO26Gatekeeper:
-    """A shared AI engine to prevent loading the model multiple times."""
-    def __init__(self, front_model_path, back_model_path):
-        # Load the OpenVINO model specifically for Intel CPU
-        self.front_model = YOLO(front_model_path, task='detect')
-        self.back_model = YOLO(back_model_path, task='detect')
-
-    def front_has_targets(self, frame, camera_name):
-        if frame is None: return False
-
-        results = self.front_model.predict(
-            source=frame,
-            imgsz='320',
-            classes=TARGET_ACTIVATION,
-            conf=FRONT_DETECT_CONF,
-            verbose=False,
-            device=DEVICE_TYPE
-        )
-
-        correct_targets = []
-        for result in results:
-            if len(result.boxes) == 0:
-                continue
-
-            for box in result.boxes:
-                conf = float(box.conf)
-                cls_id = int(box.cls)
-                label = TARGET_NAMES.get(cls_id, "Unknown")
-                detect_message = f"{label} ({conf:.2f})"
-                print_message(f"[{camera_name}] Front Detected: {detect_message}")
-                correct_targets.append(detect_message)
-
-        return len(correct_targets) > 0
-
-    def back_has_targets(self, frame, camera_name):
-        results = self.back_model.predict(
-        source=frame,
-        device=DEVICE_TYPE,
-        classes=list(TARGET_NAMES.keys()),
-        conf=BACK_DETECT_CONF,
-        imgsz=IMAGE_SIZE,
-        verbose=False
-    )
-
-        target_detections = []
-
-        # 3. Process results silently
-        for result in results:
-            if len(result.boxes) == 0:
-                continue
-
-            for box in result.boxes:
-                conf = float(box.conf)
-                cls_id = int(box.cls)
-                label = TARGET_NAMES.get(cls_id, "Unknown")
-                detect_message = f"{label} ({conf:.2f})"
-                print_message(f"[{camera_name}] Back Detected: {detect_message}")
-
-                if cls_id not in TARGET_ACTIVATION:
-                    continue
-                frame_with_box = draw_detect_objectcv(cv2, box, frame, label, conf)
-                save_picture(cv2, frame_with_box, camera_name)
-                target_detections.append(detect_message)
-
-        return target_detections if target_detections else None
-
+CHECK_INTERVAL = 3  # Seconds between AI checks per camera (starting point of the adaptive cadence)
+MOTION_CHECK_INTERVAL = MOTION_DETECTION.get('CHECK_INTERVAL', 0.8)  # Seconds between motion checks per camera
 
 
 class CameraWorker:
     # When streaming: use HLS to detect stop (matches delayed content)
     # When NOT streaming: use RTSP to detect start (real-time)
-    def __init__(self, camera_name, stream_url, hls_url, gatekeeper):
+    def __init__(self, camera_name, stream_url, hls_url, gatekeeper, verifier=None, action_executor=None):
         self.camera_name = camera_name
         self.hls_url = hls_url
-        self.stream_url = stream_url[:-1] + "1"
+        camera_config = CAMERA_CONFIG.get(camera_name, {})
+        # Lower-resolution stream used for detection; older configs derive the substream from the channel suffix
+        self.stream_url = camera_config.get('DETECT_STREAM_URL') or stream_url[:-1] + "1"
         self.gatekeeper = gatekeeper
+        # Optional async back-model stage; results come back through deliver_verification
+        self.verifier = verifier
+        self._verification_lock = threading.Lock()
+        self._verified_targets = None
+        # When the verified candidate frame was captured; the stream's pre-roll is measured from it
+        self._verified_at = 0
+        self._verified_event_id = None
+        # Results for candidates queued before the last stream start belong to an event already handled
+        self._last_start_time = 0
+        # Set by the scheduler: makes this camera due immediately
+        self.wakeup = None
+        # Set in sharded mode: a stream may only start while this worker holds the camera's lease
+        self.lease_check = None
         self.last_check_time = 0
-        self.is_streaming = False
-        self.stream_start_time = 0
-        self.last_reconnect_time = 0
-
+        # Adaptive cadence: shrinks after activity, grows after quiet periods, within per-camera bounds
+        self.base_check_interval = camera_config.get('CHECK_INTERVAL', CHECK_INTERVAL)
+        self.min_check_interval = camera_config.get('CHECK_INTERVAL_MIN', ADAPTIVE_INTERVAL.get('MIN_INTERVAL', 1))
+        self.max_check_interval = camera_config.get('CHECK_INTERVAL_MAX', ADAPTIVE_INTERVAL.get('MAX_INTERVAL', 10))
+        self.check_interval = self.base_check_interval
+        check_interval_seconds.set(self.check_interval, camera=camera_name)
+        self.last_activity_time = time.time()
+        self.last_adapt_time = self.last_activity_time
+        self.last_motion_check_time = 0
+        self.motion_gate = MotionGate(camera_name) if MOTION_DETECTION.get('ENABLED', True) else None
+        # Start/stop run on the action executor; the state machine tracks where we are
+        self.stream = StreamController(camera_name, action_executor, on_change=self._on_stream_change)
+        # Persistent mode: one decoder thread (or process) per camera, reconnects with backoff on its own
+        self.grabber = None
+        if FRAME_CAPTURE.get('PERSISTENT', True):
+            grabber_class = SharedFrameSource if FRAME_CAPTURE.get('PROCESS', False) else FrameGrabber
+            self.grabber = grabber_class(camera_name, self.stream_url)
+            self.grabber.start()
+        # While streaming, read the RAM-disk segments directly instead of reopening the playlist
+        # and follow the position ffmpeg is pushing, so stop decisions match what viewers see
+        self.hls_reader = None
+        if FRAME_CAPTURE.get('HLS_READER', True):
+            self.hls_reader = HLSSegmentReader(
+                camera_name, hls_url, position=lambda: ffmpeg_supervisor.push_position(camera_name))
+
+
+    @property
+    def is_streaming(self):
+        return self.stream.is_active()
+
+    @property
+    def stream_start_time(self):
+        return self.stream.started_at
+
+    def _on_stream_change(self, camera_name):
+        if self.hls_reader is not None and not self.is_streaming:
+            self.hls_reader.close()
+        if self.wakeup is not None:
+            self.wakeup(camera_name)
 
     def get_fresh_frame(self):
+        with cycle_stage_seconds.time(camera=self.camera_name, stage="capture"):
+            frame = self._read_frame()
+        if frame is None:
+            frames_missing_total.inc(camera=self.camera_name)
+        return frame
+
+    def _read_frame(self):
         # When streaming: use HLS buffer (delayed, matches what's being streamed)
         # When NOT streaming: use RTSP (real-time)
+        if self.is_streaming and self.hls_reader is not None:
+            return self.hls_reader.read()
         url = self.hls_url if self.is_streaming else self.stream_url
-        cap = cv2.VideoCapture(url)
+        if self.grabber is not None:
+            self.grabber.set_source(url)
+            return self.grabber.read()
+
+        cap = open_capture(url)
         if not cap.isOpened():
             return None
-        for _ in range(5):
-            cap.grab()
+        if not KEYFRAMES_ONLY:
+            for _ in range(5):
+                cap.grab()
         ret, frame = cap.read()
         cap.release()
         return frame if ret else None
 
 
+    def deliver_verification(self, target_found, queued_at, event_id=None):
+        """Called from the verification worker with the back-model result for one candidate."""
+        if not target_found:
+            return
+        with self._verification_lock:
+            # A stream is already starting or live, or started after this candidate was queued:
+            # keeping the result would start a second stream once this one stops
+            if self.stream.state != IDLE or queued_at < self._last_start_time:
+                print_message(f"[{self.camera_name}] Dropped verification result: stream already started.")
+                return
+            self._verified_targets = target_found
+            self._verified_at = queued_at
+            self._verified_event_id = event_id
+        print_message(f"[{self.camera_name}] Verified in {time.time() - queued_at:.2f}s")
+        if self.wakeup is not None:
+            self.wakeup(self.camera_name)
+
+    def take_verified_targets(self):
+        """(target_found, detected_at, event_id) of a pending verification result, or Nones."""
+        # Keep the result until a stream can actually be started (e.g. previous one still stopping)
+        if self.stream.state != IDLE:
+            return None, None, None
+        with self._verification_lock:
+            target_found, self._verified_targets = self._verified_targets, None
+            return target_found, self._verified_at, self._verified_event_id
+
+    def start_stream(self, target_found, detected_at=None, event_id=None):
+        if self.lease_check is not None and not self.lease_check(self.camera_name):
+            print_message(f"[{self.camera_name}] Not starting stream: lease is no longer held.")
+            return False
+        if not self.stream.request_start(target_found, detected_at, event_id):
+            return False
+        with self._verification_lock:
+            self._verified_targets = None
+            self._last_start_time = time.time()
+        return True
+
+    def close(self):
+        """Release the capture thread when the camera moves to another worker."""
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+        if self.hls_reader is not None:
+            self.hls_reader.close()
+
+    def adapt_interval(self, active, current_time):
+        """Update the effective check interval after a motion or front-model check."""
+        interval = self.check_interval
+        if active:
+            self.last_activity_time = current_time
+            self.last_adapt_time = current_time
+            interval = max(self.min_check_interval, interval * ADAPTIVE_INTERVAL.get('SHRINK_FACTOR', 0.5))
+        elif current_time - self.last_adapt_time >= ADAPTIVE_INTERVAL.get('QUIET_PERIOD', 120):
+            self.last_adapt_time = current_time
+            interval = min(self.max_check_interval, interval * ADAPTIVE_INTERVAL.get('GROW_FACTOR', 1.5))
+
+        if not ADAPTIVE_INTERVAL.get('ENABLED', True) or interval == self.check_interval:
+            return
+        print_message(f"[{self.camera_name}] Check interval {self.check_interval:.1f}s -> {interval:.1f}s")
+        self.check_interval = interval
+        check_interval_seconds.set(interval, camera=self.camera_name)
+
+    def next_due_time(self):
+        """Earliest time at which run_cycle has real work to do."""
+        with self._verification_lock:
+            if self._verified_targets and self.stream.state == IDLE:
+                return 0
+
+        next_check = self.last_check_time + self.check_interval
+        if self.is_streaming:
+            cooldown_end = self.stream_start_time + MOTION_DETECTION.get('COOLDOWN_PERIOD', 60)
+            return max(next_check, cooldown_end)
+        if self.motion_gate is not None:
+            # Motion sampling keeps its own fixed cadence; only the front model adapts
+            return self.last_motion_check_time + MOTION_CHECK_INTERVAL
+        return next_check
+
     def run_cycle(self):
+        with cycle_seconds.time(camera=self.camera_name):
+            self._run_cycle()
+
+    def _run_cycle(self):
         current_time = time.time()
 
-        if self.is_streaming and current_time - self.stream_start_time < MOTION_DETECTION.get('COOLDOWN_PERIOD', 60):
+        target_found, detected_at, event_id = self.take_verified_targets()
+        if target_found and not self.is_streaming:
+            self.start_stream(target_found, detected_at, event_id)
             return
 
-        if current_time - self.last_check_time < CHECK_INTERVAL:
+        if self.is_streaming and current_time - self.stream_start_time < MOTION_DETECTION.get('COOLDOWN_PERIOD', 60):
             return
 
-        frame = self.get_fresh_frame()
-        if frame is None: return
+        if self.motion_gate is not None and not self.is_streaming:
+            # Pixel-level pre-gate: the front model only runs once the scene is moving
+            if current_time - self.last_motion_check_time < MOTION_CHECK_INTERVAL:
+                return
+            self.last_motion_check_time = current_time
+
+            frame = self.get_fresh_frame()
+            if frame is None: return
+
+            with cycle_stage_seconds.time(camera=self.camera_name, stage="motion"):
+                is_moving = self.motion_gate.update(frame)
+            if self.motion_gate.warming_up:
+                # No background model yet: let the front model decide at its normal cadence
+                is_moving = True
+            else:
+                self.adapt_interval(is_moving, current_time)
+            if not is_moving:
+                return
+            if current_time - self.last_check_time < self.check_interval:
+                return
+        else:
+            if current_time - self.last_check_time < self.check_interval:
+                return
+
+            frame = self.get_fresh_frame()
+            if frame is None: return
 
         # Perform the "Front-End" AI Check
-        is_targets = self.gatekeeper.front_has_targets(frame, self.camera_name)
+        with cycle_stage_seconds.time(camera=self.camera_name, stage="front"):
+            is_targets = self.gatekeeper.front_has_targets(frame, self.camera_name)
         self.last_check_time = current_time
+        self.adapt_interval(bool(is_targets), current_time)
+
 
+        tracker = self.gatekeeper.tracker_for(self.camera_name) if TRACKER.get('ENABLED', True) else None
+        if tracker is not None and is_targets:
+            with cycle_stage_seconds.time(camera=self.camera_name, stage="track"):
+                novel_targets, known_targets, known_event_id = tracker.observe(is_targets, frame.shape, current_time)
+        else:
+            novel_targets, known_targets, known_event_id = is_targets, None, None
 
         if is_targets and not self.is_streaming:
-            target_found = self.gatekeeper.back_has_targets(frame, self.camera_name)
+            if known_targets:
+                # Same object the back model already verified: no need to run it again
+                self.start_stream(known_targets, current_time, known_event_id)
+                return
+            if not novel_targets:
+                # Only objects the back model rejected recently
+                return
+            if self.verifier is not None:
+                # Hand the candidate to the back-model worker and keep checking
+                if isinstance(self.grabber, SharedFrameSource):
+                    # A shared-memory view is only valid until our next read
+                    frame = frame.copy()
+                self.verifier.submit(self, frame, novel_targets)
+                return
+            with cycle_stage_seconds.time(camera=self.camera_name, stage="back"):
+                target_found, event_id = self.gatekeeper.back_has_targets(frame, self.camera_name, novel_targets)
             if not target_found:
                 return
-            start_ffmpeg_stream(self.camera_name, target_found)
-            self.is_streaming = True
-            self.stream_start_time = time.time()
+            self.start_stream(target_found, current_time, event_id)
 
         elif self.is_streaming and not is_targets:
-            self.is_streaming = False
-            self.stream_start_time = 0
-            stop_ffmpeg_stream(self.camera_name)
+            # A single front-model miss is not enough: the tracks must have gone quiet
+            if tracker is not None and tracker.has_recent(TRACKER.get('STOP_PERSISTENCE', 10), current_time):
+                return
+            # Only a live stream can be stopped; a stream still starting is left alone.
+            # The motion gate keeps its background: it only ever sees the RTSP view, and KNN adapts.
+            self.stream.request_stop()
 
 
 def main():
     # 1. Initialize the SHARED model once
-    gatekeeper = YOLO26Gatekeeper(FRONT_MODEL_PATH, BACK_MODEL_PATH)
+    remote_url = DETECT_ENDPOINT if DETECTION_SERVICE.get('REMOTE', False) else None
+    gatekeeper = YOLO26Gatekeeper(FRONT_MODEL_PATH, BACK_MODEL_PATH, remote_url)
+    verifier = None
+    if BACK_VERIFICATION.get('ASYNC', True):
+        verifier = VerificationQueue(gatekeeper.back_has_targets, BACK_VERIFICATION.get('MAX_PENDING', 8))
     # 2. Setup your cameras (Load from your CAMERA_CONFIG)
     # Example: cameras = [CameraWorker("FrontDoor", "rtsp://...", gatekeeper), ...]
-    cameras = []
-    for name, cfg in CAMERA_CONFIG.items():
-        hls_url = f"{HLS_ROOT_RAM_DISK}/{name}/{INDEX_M3U8}"
-        cameras.append(CameraWorker(name, cfg["STREAM_URL"], hls_url, gatekeeper))
-
-    print(f"Monitoring {len(cameras)} cameras every {CHECK_INTERVAL}s...")
+    # Stream start/stop actions of several cameras can run at the same time
+    action_executor = ThreadPoolExecutor(
+        max_workers=STREAM_ACTIONS.get('MAX_WORKERS', 4), thread_name_prefix="stream-action")
 
-    # 3. Main Loop
-    with ThreadPoolExecutor(max_workers=len(cameras)) as executor:
-        while True:
-            futures = [executor.submit(cam.run_cycle) for cam in cameras]
-            for f in futures:
-                f.result()
-            time.sleep(0.1) # Prevents 100% CPU usage on the main thread
+    def make_worker(name):
+        hls_url = f"{HLS_ROOT_RAM_DISK}/{name}/{INDEX_M3U8}"
+        return CameraWorker(name, CAMERA_CONFIG[name]["STREAM_URL"], hls_url, gatekeeper, verifier, action_executor)
+
+    def restore_states(cameras):
+        # Rebuild stream state left by a previous run or a previous owner (one bulk Redis read)
+        try:
+            saved_states = load_camera_states_from_redis(cam.camera_name for cam in cameras)
+        except Exception as e:
+            print_message(f"Could not load camera state from Redis: {e}")
+            saved_states = {}
+        for cam in cameras:
+            cam.stream.restore(saved_states.get(cam.camera_name) or {})
+
+    sharded = SHARDING.get('ENABLED', False)
+    cameras = [] if sharded else [make_worker(name) for name in CAMERA_CONFIG]
+    restore_states(cameras)
+
+    # 3. Main Loop: only cameras that are due get dispatched, no barrier between them
+    max_workers = min(len(CAMERA_CONFIG), SCHEDULER.get('MAX_WORKERS', 8))
+    scheduler = CameraScheduler(cameras, max_workers, SCHEDULER.get('MIN_DELAY', 0.1))
+
+    # A front batch only waits for cameras whose cycle is still running
+    if gatekeeper.front_batcher is not None:
+        gatekeeper.front_batcher.in_flight = scheduler.in_flight
+
+    # Capacity gauges are read at scrape time
+    start_metrics_server()
+    streaming_cameras.set_function(lambda: sum(cam.is_streaming for cam in list(scheduler.cameras.values())))
+    if gatekeeper.front_batcher is not None:
+        queue_depth.set_function(gatekeeper.front_batcher.depth, queue="front_batch")
+    if verifier is not None:
+        queue_depth.set_function(verifier.depth, queue="verification")
+    queue_depth.set_function(get_dispatcher().depth, queue="webhook")
+
+    # Pre-warm the YouTube client so the alert path never waits on auth or discovery
+    try:
+        get_authenticated_service()
+    except Exception as e:
+        print_message(f"Could not initialize YouTube client: {e}")
+
+    # Keep a ready-to-go broadcast per camera so a trigger only has to go live
+    start_broadcast_pool([cam.camera_name for cam in cameras])
+
+    if sharded:
+        def acquire(name):
+            cam = make_worker(name)
+            cam.lease_check = leases.holds
+            restore_states([cam])
+            add_broadcast_pool_camera(name)
+            scheduler.add(cam)
+
+        def release(name, lost):
+            # Bounded: this runs on the lease thread, which must get back to renewing the other leases
+            cam, idle = scheduler.remove(name, timeout=RENEW_INTERVAL)
+            if cam is None:
+                return True
+            if not lost and (not idle or cam.stream.state != IDLE):
+                # Never hand over a camera mid-cycle or mid-stream; try again on the next rebalance
+                scheduler.add(cam)
+                return False
+            if lost:
+                # Someone else owns it now: stop pushing our stream, also one that is still starting
+                cam.stream.abort()
+            cam.close()
+            remove_broadcast_pool_camera(name)
+            return True
+
+        leases = LeaseManager(acquire, release)
+        leases.start()
+        print(f"Worker {leases.worker_id} sharing {len(CAMERA_CONFIG)} cameras through Redis leases...")
+    else:
+        print(f"Monitoring {len(cameras)} cameras every {CHECK_INTERVAL}s (adaptive {ADAPTIVE_INTERVAL.get('MIN_INTERVAL', 1)}-{ADAPTIVE_INTERVAL.get('MAX_INTERVAL', 10)}s)...")
+
+    scheduler.run_forever()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import cv2
+from config import MOTION_DETECTION
+
+THRESHOLD = MOTION_DETECTION.get("THRESHOLD", 200)
+SENSITIVITY = MOTION_DETECTION.get("SENSITIVITY", 15)
+DOWNSCALE_WIDTH = MOTION_DETECTION.get("DOWNSCALE_WIDTH", 320)
+FORCE_RESIZE = MOTION_DETECTION.get("FORCE_RESIZE", False)
+LEARNING_RATE = MOTION_DETECTION.get("LEARNING_RATE", 0.05)
+MIN_MOTION_FRAMES = MOTION_DETECTION.get("MIN_MOTION_FRAMES", 4)
+KNN_WARMUP_FRAMES = MOTION_DETECTION.get("KNN_WARMUP_FRAMES", 30)
+METHOD = MOTION_DETECTION.get("METHOD", "KNN")
+
+
+class MotionGate:
+    """
+    Cheap pixel-level motion check that runs before the YOLO front model.
+    Works on downscaled grayscale frames and only opens after MIN_MOTION_FRAMES
+    consecutive frames with more than THRESHOLD changed pixels. While the first
+    KNN_WARMUP_FRAMES are learned it is warming_up and callers should not rely on it.
+    """
+    def __init__(self, camera_name):
+        self.camera_name = camera_name
+        self.reset()
+
+    @property
+    def warming_up(self) -> bool:
+        return self.frames_seen <= KNN_WARMUP_FRAMES
+
+    def reset(self):
+        """Forget the background model, e.g. when the camera view changed."""
+        self.subtractor = None
+        self.background = None
+        self.frames_seen = 0
+        self.motion_frames = 0
+        if METHOD == "KNN":
+            # dist2Threshold is a squared distance, SENSITIVITY is a per-pixel delta
+            self.subtractor = cv2.createBackgroundSubtractorKNN(
+                history=max(KNN_WARMUP_FRAMES, 1) * 10,
+                dist2Threshold=float(SENSITIVITY ** 2),
+                detectShadows=False
+            )
+        elif METHOD == "MOG2":
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=max(KNN_WARMUP_FRAMES, 1) * 10,
+                varThreshold=float(SENSITIVITY ** 2),
+                detectShadows=False
+            )
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        if FORCE_RESIZE or width > DOWNSCALE_WIDTH:
+            scaled_height = max(int(height * DOWNSCALE_WIDTH / width), 1)
+            frame = cv2.resize(frame, (DOWNSCALE_WIDTH, scaled_height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _changed_pixels(self, gray):
+        if self.subtractor is not None:
+            # Let the model pick its own rate while it learns the background
+            rate = -1 if self.frames_seen < KNN_WARMUP_FRAMES else LEARNING_RATE
+            mask = self.subtractor.apply(gray, learningRate=rate)
+            return cv2.countNonZero(mask)
+
+        # Running average fallback
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype("float32")
+            return 0
+        delta = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, LEARNING_RATE)
+        _, mask = cv2.threshold(delta, SENSITIVITY, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask)
+
+    def update(self, frame):
+        """Feed one frame. Returns True once enough consecutive motion frames were seen."""
+        if frame is None:
+            return False
+
+        changed = self._changed_pixels(self._prepare(frame))
+        self.frames_seen += 1
+        if self.warming_up:
+            return False
+
+        if changed > THRESHOLD:
+            self.motion_frames += 1
+        else:
+            self.motion_frames = 0
+
+        return self.motion_frames >= MIN_MOTION_FRAMES
@@ -1,23 +1,55 @@
+import json
 import redis
 from config import REDIS
 from utils import print_message
 
 # Redis connection setup (replace with your Redis host and port if needed)
-redis_client = redis.StrictRedis(host=REDIS["HOST"], port=REDIS["PORT"], db=0, decode_responses=True)
+# One pool shared by every thread; connections are reused instead of reopened
+redis_pool = redis.ConnectionPool(
+    host=REDIS["HOST"],
+    port=REDIS["PORT"],
+    db=0,
+    decode_responses=True,
+    max_connections=REDIS.get("MAX_CONNECTIONS", 20)
+)
+redis_client = redis.StrictRedis(connection_pool=redis_pool)
+
+# Runtime state of a camera lives in one hash; it expires if the detector stops touching it
+STATE_TTL = REDIS.get("STATE_TTL", 7 * 24 * 3600)
+
+
+def camera_state_key(camera_name: str) -> str:
+    return f"camera:{camera_name}"
+
+
+def _set_camera_fields(camera_name: str, **fields) -> None:
+    key = camera_state_key(camera_name)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, mapping={field: str(value) for field, value in fields.items()})
+    pipe.expire(key, STATE_TTL)
+    pipe.execute()
+
+
+def _delete_camera_fields(camera_name: str, *fields) -> None:
+    redis_client.hdel(camera_state_key(camera_name), *fields)
 
 
 def save_broadcast_id_to_redis(camera_name: str, broadcast_id: str) -> None:
-    """Save the broadcast ID to Redis with a key based on the camera name."""
-    redis_key = f"{camera_name}_broadcast_id"
-    redis_client.set(redis_key, broadcast_id)
+    """Save the broadcast ID in the camera's state hash."""
+    _set_camera_fields(camera_name, broadcast_id=broadcast_id)
     print_message(f"Saved broadcast ID {broadcast_id} to Redis for camera {camera_name}.")
 
 def get_broadcast_id_from_redis(camera_name: str) -> str:
-    """Retrieve the broadcast ID from Redis for the given camera."""
-    redis_key = f"{camera_name}_broadcast_id"
-    broadcast_id = redis_client.get(redis_key)
+    """Retrieve and delete the broadcast ID for the given camera in one atomic round-trip."""
+    key = camera_state_key(camera_name)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hget(key, "broadcast_id")
+    pipe.hdel(key, "broadcast_id")
+    # Key written by versions before the per-camera hash
+    pipe.getdel(f"{camera_name}_broadcast_id")
+    broadcast_id, _, legacy_broadcast_id = pipe.execute()
+    broadcast_id = broadcast_id or legacy_broadcast_id
     if broadcast_id:
-        redis_client.delete(redis_key)
         print_message(f"Retrieved and deleted broadcast ID {broadcast_id} from Redis for camera {camera_name}.")
         return broadcast_id
     else:
@@ -25,4 +57,76 @@ def get_broadcast_id_from_redis(camera_name: str) -> str:
         return None
 
 
+def save_prepared_broadcast_to_redis(camera_name: str, broadcast_id: str, created_at: float) -> None:
+    """Remember the pre-provisioned broadcast so a restart can reuse it instead of leaking it."""
+    _set_camera_fields(camera_name, prepared_broadcast=f"{broadcast_id}|{created_at}")
+
+
+def parse_prepared_broadcast(value):
+    if not value:
+        return None
+    broadcast_id, _, created_at = value.partition("|")
+    return broadcast_id, float(created_at or 0)
+
+
+def get_prepared_broadcast_from_redis(camera_name: str):
+    """Return (broadcast_id, created_at) of the pre-provisioned broadcast, or None."""
+    return parse_prepared_broadcast(redis_client.hget(camera_state_key(camera_name), "prepared_broadcast"))
+
+
+def delete_prepared_broadcast_from_redis(camera_name: str) -> None:
+    _delete_camera_fields(camera_name, "prepared_broadcast")
+
+
+def save_ffmpeg_pid_to_redis(camera_name: str, pid: int, started_at: float) -> None:
+    """Mirror the ffmpeg PID so a restarted detector can find the stream it left running."""
+    _set_camera_fields(camera_name, ffmpeg_pid=f"{pid}|{started_at}")
+
+
+def parse_ffmpeg_pid(value):
+    if not value:
+        return None
+    pid, _, started_at = value.partition("|")
+    return int(pid), float(started_at or 0)
+
+
+def get_ffmpeg_pid_from_redis(camera_name: str):
+    """Return (pid, started_at) of the mirrored ffmpeg, or None."""
+    return parse_ffmpeg_pid(redis_client.hget(camera_state_key(camera_name), "ffmpeg_pid"))
+
+
+def delete_ffmpeg_pid_from_redis(camera_name: str) -> None:
+    _delete_camera_fields(camera_name, "ffmpeg_pid")
+
+
+def save_stream_state_to_redis(camera_name: str, state: str, started_at: float) -> None:
+    """Persist the stream state machine (idle/starting/live/stopping) of a camera."""
+    _set_camera_fields(camera_name, stream_state=state, stream_start_time=started_at)
+
+
+def load_camera_states_from_redis(camera_names) -> dict:
+    """Bulk-read the state hash of every camera in one round-trip: {camera: {field: value}}."""
+    camera_names = list(camera_names)
+    pipe = redis_client.pipeline(transaction=False)
+    for camera_name in camera_names:
+        pipe.hgetall(camera_state_key(camera_name))
+    return dict(zip(camera_names, pipe.execute()))
+
+
+def save_thumbnail_entry_to_redis(camera_name: str, event_id: str, entry: dict) -> None:
+    """Mirror one thumbnail index entry (path, size, created) under the camera's thumbnail hash."""
+    key = f"{camera_state_key(camera_name)}:thumbnails"
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, event_id, json.dumps(entry))
+    pipe.expire(key, STATE_TTL)
+    pipe.execute()
+
+
+def delete_thumbnail_entry_from_redis(camera_name: str, event_id: str) -> None:
+    redis_client.hdel(f"{camera_state_key(camera_name)}:thumbnails", event_id)
+
 
+def get_thumbnail_entries_from_redis(camera_name: str) -> dict:
+    """Return {event_id: entry} of the mirrored thumbnail index for this camera."""
+    saved = redis_client.hgetall(f"{camera_state_key(camera_name)}:thumbnails")
+    return {event_id: json.loads(value) for event_id, value in saved.items()}
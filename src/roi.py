@@ -0,0 +1,70 @@
+from config import ROI_VERIFY
+
+PADDING = ROI_VERIFY.get("PADDING", 0.25)
+MIN_CROP_SIZE = ROI_VERIFY.get("MIN_CROP_SIZE", 160)
+MAX_CROPS = ROI_VERIFY.get("MAX_CROPS", 4)
+MAX_AREA_RATIO = ROI_VERIFY.get("MAX_AREA_RATIO", 0.6)
+
+
+def pad_box(xyxy, width, height, padding=PADDING, min_size=MIN_CROP_SIZE):
+    """Grow a box by padding (fraction of its size), at least to min_size, clipped to the frame."""
+    x1, y1, x2, y2 = xyxy
+    box_w, box_h = x2 - x1, y2 - y1
+    pad_x = max(box_w * padding, (min_size - box_w) / 2, 0)
+    pad_y = max(box_h * padding, (min_size - box_h) / 2, 0)
+    return (
+        max(int(x1 - pad_x), 0),
+        max(int(y1 - pad_y), 0),
+        min(int(x2 + pad_x), width),
+        min(int(y2 + pad_y), height),
+    )
+
+
+def boxes_overlap(a, b) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def box_area(box) -> float:
+    return max(box[2] - box[0], 0) * max(box[3] - box[1], 0)
+
+
+def iou(a, b) -> float:
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    inter = box_area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+    if inter == 0:
+        return 0.0
+    return inter / (box_area(a) + box_area(b) - inter)
+
+
+def merge_boxes(boxes):
+    """Union overlapping boxes until none overlap."""
+    merged = list(boxes)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for box in merged:
+            for i, other in enumerate(result):
+                if boxes_overlap(box, other):
+                    result[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                                 max(box[2], other[2]), max(box[3], other[3]))
+                    changed = True
+                    break
+            else:
+                result.append(box)
+        merged = result
+    return merged
+
+
+def crop_regions(frame, boxes):
+    """
+    Padded, merged crops around candidate boxes as (x_offset, y_offset, crop).
+    Returns None when cropping would not save work (too many crops or most of the frame).
+    """
+    height, width = frame.shape[:2]
+    regions = merge_boxes([pad_box(box, width, height) for box in boxes])
+    if not regions or len(regions) > MAX_CROPS:
+        return None
+    if sum(box_area(box) for box in regions) > MAX_AREA_RATIO * width * height:
+        return None
+    return [(x1, y1, frame[y1:y2, x1:x2].copy()) for x1, y1, x2, y2 in regions]
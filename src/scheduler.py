@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import print_message
+
+
+class CameraScheduler:
+    """
+    Deadline-based dispatcher for CameraWorker.run_cycle.
+    Keeps a min-heap of per-camera next-due times and only hands cameras that are
+    due to the worker pool. There is no barrier: a slow camera only delays itself.
+    """
+    def __init__(self, cameras, max_workers, min_delay=0.1):
+        self.cameras = {camera.camera_name: camera for camera in cameras}
+        self.max_workers = max(int(max_workers), 1)
+        self.min_delay = min_delay
+        self._heap = []
+        self._entry_seq = {}
+        self._running = set()
+        self._rerun = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+        now = time.time()
+        for camera in cameras:
+            camera.wakeup = self.wake
+            self._push(camera.camera_name, now)
+
+    def _push(self, name, due):
+        seq = next(self._counter)
+        self._entry_seq[name] = seq
+        heapq.heappush(self._heap, (due, seq, name))
+
+    def add(self, camera):
+        """Start dispatching a camera, e.g. after its lease was acquired."""
+        with self._cond:
+            camera.wakeup = self.wake
+            self.cameras[camera.camera_name] = camera
+            # A cycle still in progress (remove() timed out) schedules the next one when it ends
+            if camera.camera_name not in self._running:
+                self._push(camera.camera_name, time.time())
+            self._cond.notify_all()
+
+    def remove(self, camera_name, timeout=None):
+        """
+        Stop dispatching a camera and wait up to timeout for a cycle in progress to finish.
+        Returns (camera, idle); idle is False if the cycle is still running.
+        """
+        with self._cond:
+            camera = self.cameras.pop(camera_name, None)
+            # Its heap entry becomes stale and is dropped by _next_due
+            self._entry_seq.pop(camera_name, None)
+            self._rerun.discard(camera_name)
+            idle = self._cond.wait_for(lambda: camera_name not in self._running, timeout)
+            return camera, idle
+
+    def in_flight(self) -> int:
+        """Camera cycles running right now."""
+        with self._cond:
+            return len(self._running)
+
+    def wake(self, camera_name):
+        """Make a camera due right now, e.g. when a verification result arrives."""
+        with self._cond:
+            if camera_name not in self.cameras:
+                return
+            if camera_name in self._running:
+                self._rerun.add(camera_name)
+                return
+            self._push(camera_name, time.time())
+            self._cond.notify()
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                # Drop entries superseded by a later _push for the same camera
+                while self._heap and self._entry_seq.get(self._heap[0][2]) != self._heap[0][1]:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                due, _, name = self._heap[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+
+                heapq.heappop(self._heap)
+                del self._entry_seq[name]
+                self._running.add(name)
+                return self.cameras[name]
+
+    def _run_camera(self, camera):
+        name = camera.camera_name
+        try:
+            camera.run_cycle()
+        except Exception as e:
+            print_message(f"[{name}] Cycle failed: {e}")
+
+        now = time.time()
+        try:
+            due = max(camera.next_due_time(), now + self.min_delay)
+        except Exception as e:
+            print_message(f"[{name}] Could not compute next check time: {e}")
+            due = now + self.min_delay
+
+        with self._cond:
+            self._running.discard(name)
+            if name in self._rerun:
+                self._rerun.discard(name)
+                due = now
+            if name in self.cameras:
+                self._push(name, due)
+            # Wakes the dispatcher and a remove() waiting for this cycle
+            self._cond.notify_all()
+
+    def run_forever(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                camera = self._next_due()
+                executor.submit(self._run_camera, camera)
@@ -0,0 +1,221 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from config import FRAME_CAPTURE
+from utils import print_message
+from frame_grabber import FrameGrabber, MAX_FRAME_AGE
+
+FRAME_WIDTH = FRAME_CAPTURE.get("SHM_WIDTH", 1280)
+FRAME_HEIGHT = FRAME_CAPTURE.get("SHM_HEIGHT", 720)
+SLOTS = FRAME_CAPTURE.get("SHM_SLOTS", 4)
+
+# Control words at the start of the segment
+WRITE_SEQ, LATEST_SLOT, PINNED_SLOT = range(3)
+CONTROL_WORDS = 4
+WRITING = -1  # Slot sequence while the capture process is decoding into it
+
+# Not multiprocessing: a spawned child re-imports the parent's __main__ (the models, the YouTube client, ...).
+# capture_main.py only imports this module and frame_grabber.
+CAPTURE_MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture_main.py")
+
+
+class FrameRing:
+    """
+    Fixed-size ring of frames in one shared memory segment.
+    Layout: control words, per-slot sequence numbers and timestamps, then the frames.
+    One writer (the capture process) and one reader (the camera thread); the slot the
+    reader is using is pinned so the writer skips it, which makes the returned frame a
+    NumPy view that stays valid until the next read_latest().
+    """
+    def __init__(self, name=None, shape=(FRAME_HEIGHT, FRAME_WIDTH, 3), slots=SLOTS, create=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        header_bytes = 8 * (CONTROL_WORDS + 2 * slots)
+        size = header_bytes + slots * int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        self._control = np.ndarray((CONTROL_WORDS,), np.int64, buf, 0)
+        self._slot_seq = np.ndarray((slots,), np.int64, buf, 8 * CONTROL_WORDS)
+        self._slot_time = np.ndarray((slots,), np.float64, buf, 8 * (CONTROL_WORDS + slots))
+        self.frames = np.ndarray((slots,) + self.shape, np.uint8, buf, header_bytes)
+        self._next_slot = 0
+        if create:
+            self._control[:] = (0, -1, -1, 0)
+            self._slot_seq[:] = 0
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._control[WRITE_SEQ])
+
+    # --- Writer side ---
+
+    def begin_write(self):
+        """Reserve a slot for the next frame; returns (slot, view to decode into)."""
+        for _ in range(self.slots):
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.slots
+            if slot == self._control[LATEST_SLOT] and self.slots > 1:
+                continue
+            previous = self._slot_seq[slot]
+            # Mark first, then check the pin: a reader pinning in between sees WRITING and retries
+            self._slot_seq[slot] = WRITING
+            if slot == self._control[PINNED_SLOT]:
+                self._slot_seq[slot] = previous
+                continue
+            return slot, self.frames[slot]
+        raise RuntimeError("No free frame slot")
+
+    def commit(self, slot, timestamp):
+        seq = self.write_seq + 1
+        self._slot_time[slot] = timestamp
+        self._slot_seq[slot] = seq
+        self._control[LATEST_SLOT] = slot
+        self._control[WRITE_SEQ] = seq
+
+    # --- Reader side ---
+
+    def read_latest(self):
+        """(seq, timestamp, frame view) of the newest complete frame, or None."""
+        for _ in range(3):
+            seq = int(self._control[WRITE_SEQ])
+            slot = int(self._control[LATEST_SLOT])
+            if seq == 0 or slot < 0:
+                return None
+            self._control[PINNED_SLOT] = slot
+            # The writer may have moved on (or started overwriting) before the pin landed
+            if self._slot_seq[slot] != seq:
+                continue
+            return seq, float(self._slot_time[slot]), self.frames[slot]
+        return None
+
+    def close(self):
+        # Views into the buffer must go before the mapping can be closed
+        self._control = self._slot_seq = self._slot_time = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A caller still holds a frame view; the mapping goes away with the process
+            pass
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class RingFrameGrabber(FrameGrabber):
+    """FrameGrabber running inside a capture process, decoding straight into ring slots."""
+    def __init__(self, camera_name, url, ring):
+        super().__init__(camera_name, url)
+        self.ring = ring
+        self._slot = None
+
+    def _decode(self, cap):
+        self._slot, view = self.ring.begin_write()
+        ret, frame = cap.read(view)
+        if ret and frame is not None and frame.__array_interface__["data"][0] != view.__array_interface__["data"][0]:
+            # Decoder size differs from the ring (e.g. RTSP substream vs HLS): scale into the slot
+            cv2.resize(frame, (self.ring.shape[1], self.ring.shape[0]), dst=view)
+        return ret, view if ret else None
+
+    def _publish(self, frame, cap_url):
+        if cap_url == self.url:
+            self.ring.commit(self._slot, time.time())
+
+    def listen(self, commands):
+        # One JSON command per line from the detector process; end of input means the parent is gone
+        for line in commands:
+            try:
+                command = json.loads(line)
+            except ValueError:
+                continue
+            if command.get("command") == "source":
+                self.set_source(command["url"])
+            elif command.get("command") == "stop":
+                break
+        self._running = False
+
+
+class SharedFrameSource:
+    """
+    Drop-in for FrameGrabber that decodes in a separate process.
+    Frames arrive through a shared memory FrameRing, so decoding runs on another core
+    without the GIL and read() returns a view without pickling or copying.
+    """
+    def __init__(self, camera_name, url):
+        self.camera_name = camera_name
+        self.url = url
+        self.ring = FrameRing(create=True)
+        self._min_seq = 0
+        self._process = None
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._spawn()
+
+    def _spawn(self):
+        if self._process is not None:
+            self._process.stdin.close()
+        height, width, _ = self.ring.shape
+        self._process = subprocess.Popen(
+            [sys.executable, CAPTURE_MAIN, self.camera_name, self.url, self.ring.name,
+             str(height), str(width), str(self.ring.slots)],
+            stdin=subprocess.PIPE,
+            text=True,
+        )
+
+    def _send(self, **command):
+        self._process.stdin.write(json.dumps(command) + "\n")
+        self._process.stdin.flush()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        try:
+            self._send(command="stop")
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self.ring.close()
+        self.ring.unlink()
+
+    def set_source(self, url):
+        """Switch to another URL (RTSP <-> HLS); frames decoded from the old one are ignored."""
+        if url == self.url:
+            return
+        self.url = url
+        self._min_seq = self.ring.write_seq
+        try:
+            self._send(command="source", url=url)
+        except OSError as e:
+            print_message(f"[{self.camera_name}] Could not reach capture process: {e}")
+
+    def read(self):
+        """Return a view of the newest decoded frame, or None if there is no recent one."""
+        if self._running and self._process.poll() is not None:
+            print_message(f"[{self.camera_name}] Capture process exited ({self._process.returncode}), restarting...")
+            self._min_seq = self.ring.write_seq
+            self._spawn()
+            return None
+
+        latest = self.ring.read_latest()
+        if latest is None:
+            return None
+        seq, frame_time, frame = latest
+        if seq <= self._min_seq or time.time() - frame_time > MAX_FRAME_AGE:
+            return None
+        return frame
@@ -1,64 +1,68 @@
-import sys
-import subprocess
 from webhook import send_webhook
 from utils import print_message
 from youtube import start_youtube_broadcast_stream
-from config import CAMERA_CONFIG, FFMPEG_BIN, INDEX_M3U8, HLS_ROOT_RAM_DISK
+from broadcast_pool import take_prepared_broadcast
+from ffmpeg_registry import registry as ffmpeg_registry
+from ffmpeg_supervisor import supervisor as ffmpeg_supervisor, DEFAULT_LIVE_START_INDEX
+from hls_reader import segment_index_for
+from config import CAMERA_CONFIG, PRE_ROLL
+from metrics import stream_action_seconds, stream_actions_total
 
 
 
 # --- PID Check Logic ---
-# Check if ffmpeg is already running for the specific camera stream
+# Check if ffmpeg is already running for the specific camera stream (registry lookup, no `ps` scan)
 def is_ffmpeg_streaming(CAMERA_NAME: str, YOUTUBE_KEY: str) -> bool:
+    if ffmpeg_registry.is_running(CAMERA_NAME):
+        print_message(f"[{CAMERA_NAME}] Stream already running (PID: {ffmpeg_registry.get_pid(CAMERA_NAME)}).")
+        return True
+    return False
+
+
+# --- Pre-roll ---
+# Start the push PRE_ROLL seconds before the detection instead of a fixed number of segments back
+def pre_roll_start_index(CAMERA_NAME: str, detected_at) -> int:
+    if detected_at is None or not PRE_ROLL.get("ENABLED", True):
+        return DEFAULT_LIVE_START_INDEX
     try:
-        result = subprocess.run(
-            ['ps', 'aux'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        for line in result.stdout.splitlines():
-            if 'ffmpeg' in line and YOUTUBE_KEY in line:
-                print_message(f"[{CAMERA_NAME}] Stream already running (process found).")
-                return True
-        return False
+        index = segment_index_for(CAMERA_NAME).live_start_index(detected_at - PRE_ROLL.get("SECONDS", 10))
     except Exception as e:
-        print_message(f"[{CAMERA_NAME}] Error checking ffmpeg process: {e}")
-        return False
+        print_message(f"[{CAMERA_NAME}] Could not read HLS segment index: {e}")
+        index = None
+    if index is None:
+        return DEFAULT_LIVE_START_INDEX
+    print_message(f"[{CAMERA_NAME}] Starting {-index} segments back for a {PRE_ROLL.get('SECONDS', 10)}s pre-roll.")
+    return index
 
 
 # --- Start FFmpeg Stream ---
-def start_ffmpeg_stream(CAMERA_NAME, target_found):
+def start_ffmpeg_stream(CAMERA_NAME, target_found, detected_at=None, event_id=None):
+    with stream_action_seconds.time(camera=CAMERA_NAME, action="start"):
+        started = _start_ffmpeg_stream(CAMERA_NAME, target_found, detected_at, event_id)
+    stream_actions_total.inc(camera=CAMERA_NAME, action="start", result="ok" if started else "failed")
+    return started
+
+
+def _start_ffmpeg_stream(CAMERA_NAME, target_found, detected_at=None, event_id=None):
     CAM_CONFIG = CAMERA_CONFIG[CAMERA_NAME]
     YOUTUBE_KEY = CAM_CONFIG["YOUTUBE_KEY"]
 
     if is_ffmpeg_streaming(CAMERA_NAME, YOUTUBE_KEY):
-        return
+        return True
 
 
-    ffmpeg_command = [
-        FFMPEG_BIN,
-        '-re',                        # THROTTLE
-        '-live_start_index', '-30',    # START POINT: 30 segments from the end
-        '-i', f'{HLS_ROOT_RAM_DISK}/{CAMERA_NAME}/{INDEX_M3U8}',
-        '-c', 'copy',
-        '-f', 'flv',
-        f"rtmps://a.rtmp.youtube.com/live2/{YOUTUBE_KEY}"
-    ]
-
     try:
-        # Start the ffmpeg process in the background
-        process = subprocess.Popen(
-            ffmpeg_command,
-            stdout=subprocess.PIPE,  # Capture standard output (stdout)
-            stderr=subprocess.PIPE,  # Capture standard error (stderr)
-            start_new_session=True    # Decouple process from the terminal
-        )
+        # Start the ffmpeg process in the background; the supervisor drains its output and restarts it
+        process = ffmpeg_supervisor.launch(CAMERA_NAME, pre_roll_start_index(CAMERA_NAME, detected_at))
         pid = process.pid
         # Print success message after starting the stream
         print_message(f"[{CAMERA_NAME}] Successfully started YouTube stream (PID: {pid}).")
         
     except Exception as e:
         print_message(f"[{CAMERA_NAME}] FATAL ERROR starting stream: {e}")
-        sys.exit(1)
+        return False
 
 
-    video_link = start_youtube_broadcast_stream(CAMERA_NAME)
-    send_webhook(CAMERA_NAME, video_link, target_found)
\ No newline at end of file
+    video_link = start_youtube_broadcast_stream(CAMERA_NAME, take_prepared_broadcast(CAMERA_NAME), event_id)
+    send_webhook(CAMERA_NAME, video_link, target_found)
+    return True
\ No newline at end of file
@@ -1,55 +1,44 @@
 # stop_stream.py
-import os
-import signal
-import time
 from utils import print_message
 from youtube import go_end_stream
-from config import CAMERA_CONFIG
-import subprocess
+from ffmpeg_registry import registry as ffmpeg_registry
+from ffmpeg_supervisor import supervisor as ffmpeg_supervisor
+from metrics import stream_action_seconds, stream_actions_total
 
+GRACEFUL_STOP_TIMEOUT = 3  # Seconds to wait for SIGTERM before SIGKILL
 
 
-def is_ffmpeg_streaming(CAMERA_NAME:str, pid: int) -> None:
+def is_ffmpeg_streaming(CAMERA_NAME:str, pid: int) -> str:
+    result = "ok"
     try:
-        # 1. Attempt Graceful Stop (SIGTERM)
+        # 1. Attempt Graceful Stop (SIGTERM), 2. Force Kill (SIGKILL) if it is still alive
         print_message(f"[{CAMERA_NAME}] Attempting to gracefully stop FFmpeg (PID: {pid})")
-        os.kill(pid, signal.SIGTERM)
-        time.sleep(3)
-
-        # 2. Check if the process is still alive (os.kill(pid, 0) is non-destructive)
-        try:
-            os.kill(pid, 0)
-
-            # If still alive, Force Kill (SIGKILL)
-            print_message(f"[{CAMERA_NAME}] Graceful stop failed. Force killing FFmpeg (PID: {pid})")
-            os.kill(pid, signal.SIGKILL)
-
-        except ProcessLookupError:
+        if ffmpeg_registry.terminate(CAMERA_NAME, GRACEFUL_STOP_TIMEOUT):
             print_message(f"[{CAMERA_NAME}] Successfully stopped FFmpeg (PID: {pid})")
-        go_end_stream(CAMERA_NAME)
-
-
+        else:
+            print_message(f"[{CAMERA_NAME}] Graceful stop failed. Force killed FFmpeg (PID: {pid})")
+            result = "killed"
     except Exception as e:
         print_message(f"[{CAMERA_NAME}] Error while managing PID: {e}")
+        result = "failed"
+    return result
 
 
 def stop_ffmpeg_stream(CAMERA_NAME: str) -> None:
-    CAM_CONFIG = CAMERA_CONFIG[CAMERA_NAME]
-    YOUTUBE_KEY = CAM_CONFIG["YOUTUBE_KEY"]
-
-    """Check if any ffmpeg process is running with the specified stream URL."""
-    try:
-        # Run ps to check for ffmpeg processes
-        result = subprocess.run(
-            ['ps', 'aux'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        # Search for the stream URL in the ffmpeg process list
-        for line in result.stdout.splitlines():
-            if 'ffmpeg' in line and YOUTUBE_KEY in line:
-                pid = int(line.split()[1])
-                is_ffmpeg_streaming(CAMERA_NAME, pid)
-                return
-            
-        print_message(f"[{CAMERA_NAME}] No active stream is found.")
-    except Exception as e:
-        print(f"[{CAMERA_NAME}] Error checking ffmpeg process: {e}")
+    """Stop the ffmpeg push registered for this camera and end its broadcast."""
+    with stream_action_seconds.time(camera=CAMERA_NAME, action="stop"):
+        # Always, even without a process: the supervisor may be about to restart one that just died
+        ffmpeg_supervisor.release(CAMERA_NAME)
+        pid = ffmpeg_registry.get_pid(CAMERA_NAME)
+        if pid is None:
+            # Gave up after too many restarts, or died between restarts: the broadcast may still be live
+            print_message(f"[{CAMERA_NAME}] No active stream is found.")
+            result = "no_process"
+        else:
+            result = is_ffmpeg_streaming(CAMERA_NAME, pid)
+        try:
+            go_end_stream(CAMERA_NAME)
+        except Exception as e:
+            print_message(f"[{CAMERA_NAME}] Error while ending broadcast: {e}")
+            result = "failed"
+    stream_actions_total.inc(camera=CAMERA_NAME, action="stop", result=result)
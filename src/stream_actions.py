@@ -0,0 +1,157 @@
+import threading
+import time
+from utils import print_message
+from start_stream import start_ffmpeg_stream
+from stop_stream import stop_ffmpeg_stream
+from youtube import go_end_stream
+from ffmpeg_registry import registry as ffmpeg_registry
+from redis_utils import save_stream_state_to_redis, parse_ffmpeg_pid
+
+# --- Stream States ---
+IDLE = "idle"
+STARTING = "starting"
+LIVE = "live"
+STOPPING = "stopping"
+
+
+class StreamController:
+    """
+    Per-camera state machine (idle -> starting -> live -> stopping -> idle).
+    Start/stop actions (ffmpeg, YouTube API, Discord) run on a shared executor,
+    so the camera thread never waits on go_live retries or ffmpeg shutdown.
+    """
+    def __init__(self, camera_name, executor=None, on_change=None):
+        self.camera_name = camera_name
+        self.executor = executor
+        self.on_change = on_change
+        self.state = IDLE
+        self.started_at = 0
+        # Set by abort() while starting: the start action stops the stream instead of going live
+        self._stop_pending = False
+        self._lock = threading.Lock()
+
+    def is_active(self) -> bool:
+        """True while the camera should be watched through HLS (starting or live)."""
+        return self.state in (STARTING, LIVE)
+
+    def _persist(self):
+        # Survives a restart: main() rebuilds the state machine from Redis
+        try:
+            save_stream_state_to_redis(self.camera_name, self.state, self.started_at)
+        except Exception as e:
+            print_message(f"[{self.camera_name}] Could not persist stream state: {e}")
+
+    def _set_state(self, state):
+        with self._lock:
+            previous, self.state = self.state, state
+            if state == IDLE:
+                self.started_at = 0
+        self._announce(previous, state)
+
+    def _announce(self, previous, state):
+        self._persist()
+        print_message(f"[{self.camera_name}] Stream {previous} -> {state}")
+        if self.on_change is not None:
+            self.on_change(self.camera_name)
+
+    def restore(self, saved: dict) -> None:
+        """
+        Rebuild the state from the camera's Redis hash after a restart.
+        A stream whose ffmpeg is still running is adopted as live; anything else
+        that was mid-stream is cleaned up so no broadcast is left orphaned.
+        """
+        state = saved.get("stream_state", IDLE)
+        if state == IDLE:
+            return
+
+        ffmpeg_registry.adopt_saved(self.camera_name, parse_ffmpeg_pid(saved.get("ffmpeg_pid")))
+        if state == LIVE and ffmpeg_registry.is_running(self.camera_name):
+            with self._lock:
+                self.state = LIVE
+                self.started_at = float(saved.get("stream_start_time") or time.time())
+            print_message(f"[{self.camera_name}] Restored live stream from Redis.")
+            return
+
+        print_message(f"[{self.camera_name}] Cleaning up stream left {state} by a previous run.")
+        with self._lock:
+            self.state = STOPPING
+        self._dispatch(self._cleanup, saved.get("broadcast_id"))
+
+    def _cleanup(self, broadcast_id):
+        try:
+            if ffmpeg_registry.is_running(self.camera_name):
+                stop_ffmpeg_stream(self.camera_name)
+            elif broadcast_id:
+                go_end_stream(self.camera_name)
+        except Exception as e:
+            print_message(f"[{self.camera_name}] Failed to clean up stream: {e}")
+        self._set_state(IDLE)
+
+    def _dispatch(self, action, *args):
+        if self.executor is None:
+            action(*args)
+        else:
+            self.executor.submit(action, *args)
+
+    def request_start(self, target_found, detected_at=None, event_id=None) -> bool:
+        with self._lock:
+            if self.state != IDLE:
+                return False
+            self.state = STARTING
+            self.started_at = time.time()
+        self._persist()
+        self._dispatch(self._start, target_found, detected_at, event_id)
+        return True
+
+    def request_stop(self) -> bool:
+        with self._lock:
+            if self.state != LIVE:
+                return False
+            self.state = STOPPING
+        self._persist()
+        self._dispatch(self._stop)
+        return True
+
+    def abort(self) -> bool:
+        """
+        Stop whatever is running, e.g. when the camera's lease was lost: a live stream now,
+        a starting one as soon as its start action finishes. The executor keeps the controller
+        alive until then, even after the camera itself was dropped.
+        """
+        with self._lock:
+            if self.state == STARTING:
+                self._stop_pending = True
+                return True
+        return self.request_stop()
+
+    def _start(self, target_found, detected_at=None, event_id=None):
+        try:
+            started = start_ffmpeg_stream(self.camera_name, target_found, detected_at, event_id)
+        except Exception as e:
+            print_message(f"[{self.camera_name}] Failed to start stream: {e}")
+            # Do not leave a half-started ffmpeg pushing to YouTube
+            stop_ffmpeg_stream(self.camera_name)
+            started = False
+
+        with self._lock:
+            stop_pending, self._stop_pending = self._stop_pending, False
+            if started and not stop_pending:
+                self.state = LIVE
+        if started and not stop_pending:
+            self._announce(STARTING, LIVE)
+            return
+
+        if started:
+            print_message(f"[{self.camera_name}] Stop requested while starting, stopping the new stream.")
+            try:
+                stop_ffmpeg_stream(self.camera_name)
+            except Exception as e:
+                print_message(f"[{self.camera_name}] Failed to stop stream: {e}")
+        self._set_state(IDLE)
+
+    def _stop(self):
+        try:
+            stop_ffmpeg_stream(self.camera_name)
+        except Exception as e:
+            print_message(f"[{self.camera_name}] Failed to stop stream: {e}")
+        self._set_state(IDLE)
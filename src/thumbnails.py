@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from config import YOUTUBE, THUMBNAIL_STORE
+from utils import print_message, delete_file
+from redis_utils import save_thumbnail_entry_to_redis, delete_thumbnail_entry_from_redis, get_thumbnail_entries_from_redis
+
+THUMBNAIL_DIR = os.path.join(YOUTUBE.get("THUMBNAIL_PATH"), "images")
+MAX_PER_CAMERA = THUMBNAIL_STORE.get("MAX_PER_CAMERA", 3)
+MAX_TOTAL_BYTES = THUMBNAIL_STORE.get("MAX_TOTAL_BYTES", 50 * 1024 * 1024)
+MAX_AGE = THUMBNAIL_STORE.get("MAX_AGE", 3600)
+
+
+class ThumbnailStore:
+    """
+    Index of event thumbnails keyed by camera and event ID.
+    Looking up an event's thumbnail is O(1) and the newest one's bytes stay in memory;
+    files on disk and the Redis mirror let a restart pick up where it left off.
+    Old entries and orphaned files are evicted by age and total size.
+    """
+    def __init__(self, directory=THUMBNAIL_DIR):
+        self.directory = directory
+        self._index = {}
+        self._data = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0
+
+    def _entries(self, camera_name):
+        # First access after a restart: rebuild this camera's index from Redis
+        if camera_name not in self._index:
+            entries = OrderedDict()
+            try:
+                saved = get_thumbnail_entries_from_redis(camera_name)
+            except Exception as e:
+                print_message(f"[{camera_name}] Could not load thumbnail index: {e}")
+                saved = {}
+            for event_id, entry in sorted(saved.items(), key=lambda item: item[1]["created"]):
+                if os.path.exists(entry["path"]):
+                    entries[event_id] = entry
+                    self._total_bytes += entry["size"]
+            self._index[camera_name] = entries
+        return self._index[camera_name]
+
+    def put(self, camera_name: str, data: bytes) -> str:
+        """Store a new event thumbnail and return its event ID."""
+        os.makedirs(self.directory, exist_ok=True)
+        created = time.time()
+        event_id = str(int(created * 1000))
+        path = os.path.join(self.directory, f"{camera_name}-{event_id}.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        entry = {"path": path, "size": len(data), "created": created}
+        with self._lock:
+            entries = self._entries(camera_name)
+            entries[event_id] = entry
+            self._total_bytes += entry["size"]
+            # Only the newest thumbnail per camera is worth keeping in memory
+            self._data[camera_name] = (event_id, data)
+        try:
+            save_thumbnail_entry_to_redis(camera_name, event_id, entry)
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not persist thumbnail index: {e}")
+        self.evict()
+        return event_id
+
+    def get(self, camera_name: str, event_id: str) -> bytes | None:
+        with self._lock:
+            cached = self._data.get(camera_name)
+            if cached and cached[0] == event_id:
+                return cached[1]
+            entry = self._entries(camera_name).get(event_id)
+        if entry is None:
+            return None
+        try:
+            with open(entry["path"], "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def remove(self, camera_name: str, event_id: str) -> None:
+        with self._lock:
+            entry = self._entries(camera_name).pop(event_id, None)
+            if entry is None:
+                return
+            self._total_bytes -= entry["size"]
+            cached = self._data.get(camera_name)
+            if cached and cached[0] == event_id:
+                del self._data[camera_name]
+        try:
+            delete_thumbnail_entry_from_redis(camera_name, event_id)
+        except Exception as e:
+            print_message(f"[{camera_name}] Could not update thumbnail index: {e}")
+        delete_file(entry["path"])
+
+    def evict(self) -> None:
+        """Drop entries that are too old, beyond MAX_PER_CAMERA, or over MAX_TOTAL_BYTES (oldest first)."""
+        now = time.time()
+        expired = []
+        with self._lock:
+            for camera_name, entries in self._index.items():
+                for index, (event_id, entry) in enumerate(entries.items()):
+                    if now - entry["created"] > MAX_AGE or index < len(entries) - MAX_PER_CAMERA:
+                        expired.append((camera_name, event_id))
+
+            total = self._total_bytes - sum(self._index[c][e]["size"] for c, e in expired)
+            if total > MAX_TOTAL_BYTES:
+                remaining = sorted(
+                    ((entry["created"], camera_name, event_id, entry["size"])
+                     for camera_name, entries in self._index.items()
+                     for event_id, entry in entries.items()
+                     if (camera_name, event_id) not in expired),
+                )
+                for _, camera_name, event_id, size in remaining:
+                    if total <= MAX_TOTAL_BYTES:
+                        break
+                    expired.append((camera_name, event_id))
+                    total -= size
+
+        for camera_name, event_id in expired:
+            self.remove(camera_name, event_id)
+
+        if now - self._last_sweep > MAX_AGE:
+            self._last_sweep = now
+            self.sweep_orphans()
+
+    def sweep_orphans(self) -> None:
+        """Delete files in the thumbnail directory that no index entry points to and that are older than MAX_AGE."""
+        if not os.path.isdir(self.directory):
+            return
+        with self._lock:
+            known = {entry["path"] for entries in self._index.values() for entry in entries.values()}
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.path in known:
+                continue
+            try:
+                if now - entry.stat().st_mtime > MAX_AGE:
+                    delete_file(entry.path)
+            except OSError:
+                continue
+
+
+store = ThumbnailStore()
+
+
+def put_thumbnail(camera_name: str, data: bytes) -> str:
+    """Keep a new encoded thumbnail for this camera; returns its event ID."""
+    return store.put(camera_name, data)
+
+
+def get_thumbnail(camera_name: str, event_id: str | None) -> bytes | None:
+    """The thumbnail of this detection event, or None. Kept until evicted, so a stream
+    restarted for the same tracked object shows the same image."""
+    if event_id is None:
+        return None
+    return store.get(camera_name, event_id)
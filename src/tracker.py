@@ -0,0 +1,100 @@
+import threading
+import time
+from config import TRACKER
+from roi import iou
+
+IOU_THRESHOLD = TRACKER.get("IOU_THRESHOLD", 0.3)
+CHANGE_IOU = TRACKER.get("CHANGE_IOU", 0.5)
+TRACK_TTL = TRACKER.get("TRACK_TTL", 30)
+VERDICT_TTL = TRACKER.get("VERDICT_TTL", 120)
+VERDICT_IOU = TRACKER.get("VERDICT_IOU", 0.3)
+
+
+def normalize_box(xyxy, frame_shape):
+    """Boxes are kept as fractions of the frame so RTSP substream and HLS main stream tracks line up."""
+    height, width = frame_shape[:2]
+    x1, y1, x2, y2 = xyxy
+    return (x1 / width, y1 / height, x2 / width, y2 / height)
+
+
+class ObjectTracker:
+    """
+    IoU tracker for one camera's front-model detections.
+    Tracks remember the back-model verdict (verified / rejected) for VERDICT_TTL seconds,
+    so the same stationary object is not re-verified on every check.
+    """
+    def __init__(self):
+        self.tracks = []
+        self._lock = threading.Lock()
+
+    def _match(self, detection, box):
+        best, best_iou = None, IOU_THRESHOLD
+        for track in self.tracks:
+            if track["cls_id"] != detection.cls_id:
+                continue
+            overlap = iou(track["box"], box)
+            if overlap >= best_iou:
+                best, best_iou = track, overlap
+        return best
+
+    def _prune(self, now):
+        self.tracks = [track for track in self.tracks if now - track["last_seen"] <= TRACK_TTL]
+
+    def observe(self, detections, frame_shape, now=None):
+        """
+        Update tracks with front-model detections.
+        Returns (novel, verified_targets, event_id): detections that still need the back model,
+        and the remembered back-model targets and thumbnail event if a known verified object is in view.
+        """
+        now = now or time.time()
+        novel, verified_targets, event_id = [], None, None
+        with self._lock:
+            self._prune(now)
+            for detection in detections:
+                box = normalize_box(detection.xyxy, frame_shape)
+                track = self._match(detection, box)
+                if track is None:
+                    track = {"cls_id": detection.cls_id, "box": box, "last_seen": now,
+                             "verdict": None, "verdict_box": None, "verdict_until": 0, "targets": None,
+                             "event_id": None}
+                    self.tracks.append(track)
+                track["box"] = box
+                track["last_seen"] = now
+
+                known = track["verdict"] is not None and now <= track["verdict_until"]
+                # Moved or resized a lot since it was judged: judge it again
+                if known and iou(track["verdict_box"], box) < CHANGE_IOU:
+                    known = False
+                if not known:
+                    novel.append(detection)
+                elif track["verdict"] == "verified":
+                    verified_targets, event_id = track["targets"], track["event_id"]
+        return novel, verified_targets, event_id
+
+    def record_verdict(self, detections, frame_shape, accepted, event_id=None, now=None):
+        """
+        Remember the back-model outcome for the tracks behind these front detections.
+        accepted: (xyxy, detect_message) of every back-model target, in frame pixels.
+        event_id: thumbnail of this verification, reused when a verified track starts a stream.
+        Only tracks overlapping an accepted box are verified; the rest of the frame's tracks are rejected.
+        """
+        now = now or time.time()
+        accepted = [(normalize_box(xyxy, frame_shape), message) for xyxy, message in accepted]
+        with self._lock:
+            for detection in detections:
+                box = normalize_box(detection.xyxy, frame_shape)
+                track = self._match(detection, box)
+                if track is None:
+                    continue
+                targets = [message for accepted_box, message in accepted if iou(accepted_box, box) >= VERDICT_IOU]
+                track["verdict"] = "verified" if targets else "rejected"
+                track["verdict_box"] = box
+                track["verdict_until"] = now + VERDICT_TTL
+                track["targets"] = targets or None
+                track["event_id"] = event_id if targets else None
+
+    def has_recent(self, persistence, now=None) -> bool:
+        """True if any object was seen within the last `persistence` seconds."""
+        now = now or time.time()
+        with self._lock:
+            return any(now - track["last_seen"] <= persistence for track in self.tracks)
@@ -1,9 +1,6 @@
 from datetime import datetime
-from pathlib import Path
-from config import YOUTUBE
 import os
 
-THUMBNAIL_PATH = YOUTUBE.get("THUMBNAIL_PATH")
 MAX_SIZE_BYTES = 1900 * 1024  # 1.9MB
 
 
@@ -12,8 +9,8 @@ def get_timestamp() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-def draw_detect_objectcv(cv2, box, frame, label, conf):
-    x1, y1, x2, y2 = map(int, box.xyxy[0])
+def draw_detect_objectcv(cv2, xyxy, frame, label, conf):
+    x1, y1, x2, y2 = map(int, xyxy)
 
     # Draw rectangle
     cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
@@ -37,46 +34,41 @@ def draw_detect_objectcv(cv2, box, frame, label, conf):
     return frame
 
 
-def save_compressed_thumbnail(cv2, frame, output_path):
+def encode_thumbnail(cv2, frame) -> bytes:
+    """
+    Resize to 1280x720 and JPEG-encode once at the highest quality that fits MAX_SIZE_BYTES.
+    Tries quality 95 first, then binary-searches down to 20, keeping the best buffer found.
+    """
     # Resize first (very important)
     frame = cv2.resize(frame, (1280, 720))
 
-    quality = 95
-
-    while quality >= 20:
+    def encode(quality):
         success, encoded = cv2.imencode(
             ".jpg",
             frame,
             [int(cv2.IMWRITE_JPEG_QUALITY), quality]
         )
-
         if not success:
             raise Exception("Failed to encode image")
+        return encoded
 
-        if len(encoded) <= MAX_SIZE_BYTES:
-            # Write only once
-            with open(output_path, "wb") as f:
-                f.write(encoded.tobytes())
-
-            print(f"Saved thumbnail at quality {quality}")
-            return output_path
-
-        quality -= 5
-
-    raise Exception("Could not compress image under 2MB")
-
-
-def save_picture(cv2, frame, camera_name):
-    os.makedirs(f"{THUMBNAIL_PATH}/images", exist_ok=True)
+    encoded = encode(95)
+    if len(encoded) <= MAX_SIZE_BYTES:
+        return encoded.tobytes()
 
-    timestamp = get_timestamp()
-    image_path = os.path.join(
-        f"{THUMBNAIL_PATH}/images",
-        f"{camera_name}-{timestamp}.jpg"
-    )
+    best = None
+    low, high = 20, 94
+    while low <= high:
+        quality = (low + high) // 2
+        encoded = encode(quality)
+        if len(encoded) <= MAX_SIZE_BYTES:
+            best, low = encoded, quality + 1
+        else:
+            high = quality - 1
 
-    # Call the internal thumbnail compression function
-    save_compressed_thumbnail(cv2, frame, image_path)
+    if best is None:
+        raise Exception("Could not compress image under 2MB")
+    return best.tobytes()
 
 
 def print_message(message: str):
@@ -92,20 +84,6 @@ def find_camera_key(stream_url: str, CAMERA_CONFIG: dict):
             return key
     return None
 
-def find_file_by_name(partial_name: str, search_dir=THUMBNAIL_PATH) -> str:
-    """
-    Search for a file that contains the partial name in its filename.
-    Returns the full path of the matching file, or None if not found.
-    """
-    search_path = Path(search_dir)
-
-    for file in search_path.rglob(f"*{partial_name}*"):
-        if file.is_file():
-            return file
-
-    return None
-
-
 def delete_file(file_path: str):
     """Delete a file given its full path."""
     try:
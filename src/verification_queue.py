@@ -0,0 +1,66 @@
+import heapq
+import itertools
+import threading
+import time
+from utils import print_message
+
+
+class VerificationQueue:
+    """
+    Bounded priority queue of candidate frames for the heavy back model.
+    A single worker thread serves it, so front checks on other cameras keep running.
+    Each camera has at most one pending candidate: a newer frame replaces the stale one.
+    """
+    def __init__(self, verify, max_pending=8):
+        self.verify = verify
+        self.max_pending = max(int(max_pending), 1)
+        self._heap = []
+        self._pending = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="back-verifier", daemon=True)
+        self._thread.start()
+
+    def submit(self, camera, frame, front_targets) -> bool:
+        """Queue a candidate frame with its front-model hits. Stronger front confidence is verified first."""
+        name = camera.camera_name
+        priority = max((target.conf for target in front_targets), default=0.0)
+        with self._cond:
+            if name not in self._pending and len(self._pending) >= self.max_pending:
+                # Full: only make room if the newcomer outranks the weakest candidate
+                weakest = min(self._pending.values(), key=lambda entry: entry[0])
+                if weakest[0] >= priority:
+                    return False
+                del self._pending[weakest[2].camera_name]
+
+            seq = next(self._counter)
+            self._pending[name] = (priority, seq, camera, frame, front_targets, time.time())
+            heapq.heappush(self._heap, (-priority, seq, name))
+            self._cond.notify()
+            return True
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def _next(self):
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, seq, name = heapq.heappop(self._heap)
+                    entry = self._pending.get(name)
+                    # Skip heap entries that were replaced by a newer frame or evicted
+                    if entry is not None and entry[1] == seq:
+                        del self._pending[name]
+                        return entry
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            _, _, camera, frame, front_targets, queued_at = self._next()
+            try:
+                target_found, event_id = self.verify(frame, camera.camera_name, front_targets)
+            except Exception as e:
+                print_message(f"[{camera.camera_name}] Back verification failed: {e}")
+                continue
+            camera.deliver_verification(target_found, queued_at, event_id)
@@ -1,76 +1,237 @@
-import urllib.request
-import urllib.error
+import http.client
+import urllib.parse
 import datetime
 import json
+import queue
 import sys
+import threading
+import time
 from utils import print_message
+from metrics import webhook_post_seconds, webhook_messages_total
 
 # --- Import Configuration ---
 try:
-    from config import CAMERA_CONFIG
+    from config import CAMERA_CONFIG, WEBHOOK
 except ImportError:
     print_message("Error: Could not find 'config.py'. Ensure it's in the same directory.")
     sys.exit(1)
 
-def send_webhook(CAMERA_NAME: str, video_link: str, target_found: str) -> None:
+QUEUE_SIZE = WEBHOOK.get("QUEUE_SIZE", 100)
+COALESCE_WINDOW = WEBHOOK.get("COALESCE_WINDOW", 1.0)
+MAX_RETRIES = WEBHOOK.get("MAX_RETRIES", 5)
+TIMEOUT = WEBHOOK.get("TIMEOUT", 10)
+MAX_MESSAGE_LENGTH = 2000  # Discord content limit
+
+
+def build_alert_message(CAMERA_NAME: str, video_link: str, target_found) -> str | None:
+    """Validate the camera config and build the alert text, or None if it cannot be sent."""
     if CAMERA_NAME not in CAMERA_CONFIG:
         print_message(f"Error: Camera '{CAMERA_NAME}' not defined in config.py.")
-        sys.exit(1)
+        return None
 
     if "WEBHOOK_URL" not in CAMERA_CONFIG[CAMERA_NAME] or not CAMERA_CONFIG[CAMERA_NAME]["WEBHOOK_URL"]:
-        print_message(f"Error: Camera '{CAMERA_CONFIG[CAMERA_NAME]}' WEBHOOK_URL not defined in config.py.")
-        sys.exit(1)
+        print_message(f"Error: Camera '{CAMERA_NAME}' WEBHOOK_URL not defined in config.py.")
+        return None
 
     if "MESSAGE" not in CAMERA_CONFIG[CAMERA_NAME] or not CAMERA_CONFIG[CAMERA_NAME]["MESSAGE"]:
-        print_message(f"Error: Camera '{CAMERA_CONFIG[CAMERA_NAME]}' MESSAGE not defined in config.py.")
-        sys.exit(1)
+        print_message(f"Error: Camera '{CAMERA_NAME}' MESSAGE not defined in config.py.")
+        return None
 
     # Construct the final message content
     CURRENT_TIME = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    FINAL_MESSAGE = f'{CAMERA_CONFIG[CAMERA_NAME]["MESSAGE"]} [{CURRENT_TIME}]({video_link}) {target_found}'
-    DISCORD_WEBHOOK_URL = CAMERA_CONFIG[CAMERA_NAME]["WEBHOOK_URL"]
+    return f'{CAMERA_CONFIG[CAMERA_NAME]["MESSAGE"]} [{CURRENT_TIME}]({video_link}) {target_found}'
 
-    payload = {
-        "content": FINAL_MESSAGE
-    }
 
+def parse_retry_after(headers, body: bytes) -> float:
+    """Seconds to wait after a 429, from Retry-After, X-RateLimit-Reset-After or the JSON body."""
+    for header in ("Retry-After", "X-RateLimit-Reset-After"):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
     try:
-        print_message(f"Sending Discord alert for {CAMERA_NAME}: '{FINAL_MESSAGE}'")
+        return float(json.loads(body.decode("utf-8")).get("retry_after", 1))
+    except (ValueError, AttributeError):
+        return 1.0
+
+
+class AlertDispatcher:
+    """
+    Background Discord sender. Alerts never block detection: every webhook gets its own
+    bounded queue and sender thread, so a rate-limited or failing webhook only delays
+    its own alerts. Each sender keeps its HTTPS connection alive, retries with backoff
+    while honouring rate-limit headers, and merges bursts into one message.
+    """
+    def __init__(self):
+        self._queues = {}
+        self._connections = {}
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+
+    def _queue_for(self, webhook_url):
+        with self._lock:
+            alerts = self._queues.get(webhook_url)
+            if alerts is None:
+                alerts = self._queues[webhook_url] = queue.Queue(maxsize=QUEUE_SIZE)
+                threading.Thread(target=self._run, args=(webhook_url, alerts),
+                                 name=f"discord-alerts-{len(self._queues)}", daemon=True).start()
+            return alerts
+
+    def submit(self, webhook_url: str, content: str) -> None:
+        alerts = self._queue_for(webhook_url)
+        # Other cameras may refill the freed slot first, so keep going until ours is in
+        while True:
+            try:
+                alerts.put_nowait(content)
+                return
+            except queue.Full:
+                pass
+            # Drop the oldest alert rather than the newest
+            try:
+                dropped = alerts.get_nowait()
+                print_message(f"WARNING: Alert queue full, dropped: '{dropped}'")
+            except queue.Empty:
+                pass
 
-        # Assign the webhook URL to a local variable for clarity
-        webhook_url = DISCORD_WEBHOOK_URL
+    def depth(self) -> int:
+        with self._lock:
+            return sum(alerts.qsize() for alerts in self._queues.values())
 
-        # 1. Encode the payload to bytes
-        data = json.dumps(payload).encode('utf-8')
+    def _collect(self, alerts):
+        batch = [alerts.get()]
+        deadline = time.monotonic() + COALESCE_WINDOW
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(alerts.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
 
-        # 2. Define headers, including Content-Type and User-Agent
+    def _coalesce(self, lines):
+        # Pack lines (in arrival order) into messages within Discord's limit
+        messages = []
+        current = ""
+        for line in lines:
+            if current and len(current) + 1 + len(line) > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        messages.append(current[:MAX_MESSAGE_LENGTH])
+        return messages
+
+    def _run(self, webhook_url, alerts):
+        while True:
+            for content in self._coalesce(self._collect(alerts)):
+                try:
+                    with webhook_post_seconds.time():
+                        result = self._post(webhook_url, content)
+                except Exception as e:
+                    print_message(f"ERROR: Failed to send Discord message: {e}")
+                    result = "error"
+                webhook_messages_total.inc(result=result)
+
+    def _connection(self, webhook_url):
+        # One connection per webhook: only that webhook's sender thread ever uses it
+        conn = self._connections.get(webhook_url)
+        if conn is None:
+            conn = http.client.HTTPSConnection(urllib.parse.urlsplit(webhook_url).netloc, timeout=TIMEOUT)
+            self._connections[webhook_url] = conn
+        return conn
+
+    def _drop_connection(self, webhook_url):
+        conn = self._connections.pop(webhook_url, None)
+        if conn is not None:
+            conn.close()
+
+    def _exchange(self, webhook_url, path, data, headers):
+        conn = self._connection(webhook_url)
+        conn.request('POST', path, body=data, headers=headers)
+        response = conn.getresponse()
+        return response, response.read()
+
+    def _request(self, webhook_url, path, data, headers):
+        reused = webhook_url in self._connections
+        try:
+            return self._exchange(webhook_url, path, data, headers)
+        except (OSError, http.client.HTTPException):
+            self._drop_connection(webhook_url)
+            if not reused:
+                raise
+        # The kept-alive connection went stale while idle: retry at once on a fresh one, no backoff
+        return self._exchange(webhook_url, path, data, headers)
+
+    def _post(self, webhook_url: str, content: str) -> str:
+        url = urllib.parse.urlsplit(webhook_url)
+        path = f"{url.path}?{url.query}" if url.query else url.path
+        data = json.dumps({"content": content}).encode('utf-8')
         headers = {
             'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0' # Added User-Agent as per suggestion
+            'User-Agent': 'Mozilla/5.0'
         }
 
-        # 3. Create the request object
-        req = urllib.request.Request(
-            webhook_url,
-            data=data,
-            headers=headers,
-            method='POST'
-        )
-
-        # 4. Send the request (with a timeout)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            # Discord returns 204 No Content on successful message post
-            if response.getcode() == 204:
-                print_message(f"SUCCESS: Discord message sent.")
-            else:
-                # Handle unexpected success codes
-                print_message(f"INFO: Message sent, but unexpected status code: {response.getcode()}")
-
-    except urllib.error.HTTPError as e:
-        # Handles 4xx or 5xx errors from the server
-        print_message(f"ERROR: Failed to send Discord message. Status Code: {e.code}")
-        # print_message(f"Response Text: {e.read().decode('utf-8')}") # Uncomment for debugging
-
-    except urllib.error.URLError as e:
-        # Handles network issues (e.g., connection refused, DNS errors, timeout)
-        print_message(f"ERROR: Network or connection error while sending Discord message: {e.reason}")
\ No newline at end of file
+        print_message(f"Sending Discord alert: '{content}'")
+        for attempt in range(1, MAX_RETRIES + 1):
+            # Respect a bucket that Discord told us is exhausted
+            wait = self._blocked_until.get(webhook_url, 0) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                response, body = self._request(webhook_url, path, data, headers)
+            except (OSError, http.client.HTTPException) as e:
+                # Handles network issues (e.g., connection reset, DNS errors, timeout)
+                self._drop_connection(webhook_url)
+                print_message(f"ERROR: Network error while sending Discord message (attempt {attempt}): {e}")
+                time.sleep(min(2 ** attempt, 30))
+                continue
+
+            if response.getheader('X-RateLimit-Remaining') == '0':
+                reset_after = float(response.getheader('X-RateLimit-Reset-After') or 0)
+                self._blocked_until[webhook_url] = time.monotonic() + reset_after
+
+            if response.status in (200, 204):
+                print_message("SUCCESS: Discord message sent.")
+                return "sent"
+
+            if response.status == 429:
+                retry_after = parse_retry_after(response.headers, body)
+                print_message(f"Discord rate limited, retrying in {retry_after:.1f}s")
+                self._blocked_until[webhook_url] = time.monotonic() + retry_after
+                continue
+
+            if response.status >= 500:
+                print_message(f"ERROR: Discord returned {response.status} (attempt {attempt})")
+                time.sleep(min(2 ** attempt, 30))
+                continue
+
+            # Other 4xx: retrying will not help
+            print_message(f"ERROR: Failed to send Discord message. Status Code: {response.status}")
+            return "rejected"
+
+        print_message(f"ERROR: Gave up sending Discord message after {MAX_RETRIES} attempts.")
+        return "gave_up"
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> AlertDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher()
+        return _dispatcher
+
+
+def send_webhook(CAMERA_NAME: str, video_link: str, target_found: str) -> None:
+    """Queue a Discord alert for this camera; returns immediately."""
+    FINAL_MESSAGE = build_alert_message(CAMERA_NAME, video_link, target_found)
+    if FINAL_MESSAGE is None:
+        return
+    get_dispatcher().submit(CAMERA_CONFIG[CAMERA_NAME]["WEBHOOK_URL"], FINAL_MESSAGE)
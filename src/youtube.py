@@ -1,15 +1,24 @@
 from generate_token import get_authenticated_service
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from utils import print_message, find_file_by_name, delete_file
+from googleapiclient.http import MediaIoBaseUpload
+from utils import print_message
+from thumbnails import get_thumbnail
 from redis_utils import save_broadcast_id_to_redis, get_broadcast_id_from_redis
 from config import YOUTUBE
+from metrics import youtube_call_seconds
 import datetime
+import io
+import threading
 import time
 
 PLAYLIST_ID = YOUTUBE.get("PLAYLIST_ID")
 VIDEO_URL = YOUTUBE.get("VIDEO_URL")
 
+# Stream IDs never change for a camera, so list all streams only once per camera
+_stream_id_cache = {}
+_stream_id_lock = threading.Lock()
+
 
 def get_playlist_id(youtube_service: build, playlist_name: str) -> str | None:
     """
@@ -58,6 +67,7 @@ def check_video_in_playlist(youtube_service: build, video_id: str, playlist_id:
     return False
 
 
+@youtube_call_seconds.timed(call="add_video_to_playlist")
 def add_video_to_playlist(youtube_service: build, video_id: str, playlist_id: str) -> None:
     """
     Add a video to the specified playlist.
@@ -128,6 +138,22 @@ def get_existing_stream_id(youtube: build, stream_name: str) -> str | None:
     return None  # If the stream is not found
 
 
+@youtube_call_seconds.timed(call="get_cached_stream_id")
+def get_cached_stream_id(youtube: build, camera: str) -> str | None:
+    """Same as get_existing_stream_id, but remembers the answer per camera."""
+    with _stream_id_lock:
+        stream_id = _stream_id_cache.get(camera)
+    if stream_id:
+        return stream_id
+
+    stream_id = get_existing_stream_id(youtube, camera)
+    if stream_id:
+        with _stream_id_lock:
+            _stream_id_cache[camera] = stream_id
+    return stream_id
+
+
+@youtube_call_seconds.timed(call="create_scheduled_broadcast")
 def create_scheduled_broadcast(youtube: build, title: str, description: str, start_time: datetime) -> build:
     """Create a scheduled YouTube live broadcast."""
     request = youtube.liveBroadcasts().insert(
@@ -152,6 +178,35 @@ def create_scheduled_broadcast(youtube: build, title: str, description: str, sta
     return response
 
 
+@youtube_call_seconds.timed(call="update_broadcast_title")
+def update_broadcast_title(youtube: build, broadcast_id: str, title: str, start_time: str) -> None:
+    """Rename a broadcast, e.g. a pre-provisioned one that was created a while ago."""
+    # update(part="snippet") replaces the whole snippet: start from the current one so the description survives
+    response = youtube.liveBroadcasts().list(part="snippet", id=broadcast_id).execute()
+    items = response.get("items", [])
+    if not items:
+        raise ValueError(f"Broadcast {broadcast_id} not found")
+    snippet = items[0]["snippet"]
+    youtube.liveBroadcasts().update(
+        part="snippet",
+        body={
+            "id": broadcast_id,
+            "snippet": {
+                "title": title,
+                "description": snippet.get("description", ""),
+                "scheduledStartTime": start_time
+            }
+        }
+    ).execute()
+
+
+@youtube_call_seconds.timed(call="delete_broadcast")
+def delete_broadcast(youtube: build, broadcast_id: str) -> None:
+    """Delete a broadcast that was never used."""
+    youtube.liveBroadcasts().delete(id=broadcast_id).execute()
+
+
+@youtube_call_seconds.timed(call="bind_stream_to_broadcast")
 def bind_stream_to_broadcast(youtube: build, broadcast_id: str, stream_id: str) -> build:
     """Bind the existing stream to the broadcast."""
     request = youtube.liveBroadcasts().bind(
@@ -163,20 +218,19 @@ def bind_stream_to_broadcast(youtube: build, broadcast_id: str, stream_id: str)
     return response
 
 
-def set_thumbnail(youtube, video_id, camera):
-    thumbnail_path = find_file_by_name(camera)
+@youtube_call_seconds.timed(call="set_thumbnail")
+def set_thumbnail(youtube, video_id, camera, event_id=None):
+    """Upload the thumbnail encoded for the detection event that started this stream."""
+    thumbnail_data = get_thumbnail(camera, event_id)
 
-    if not thumbnail_path:
+    if not thumbnail_data:
         return
 
-    with open(thumbnail_path, 'rb') as f:
-        thumbnail_data = f.read()
-    
     youtube.thumbnails().set(
         videoId=video_id,
-        media_body=thumbnail_data
+        media_body=MediaIoBaseUpload(io.BytesIO(thumbnail_data), mimetype='image/jpeg')
     ).execute()
-    delete_file(thumbnail_path)
+    print_message(f"Thumbnail set for {video_id} ({len(thumbnail_data)} bytes).")
 
 
 def get_processing_videos(youtube: build) -> None:
@@ -206,7 +260,8 @@ def get_processing_videos(youtube: build) -> None:
         print_message(f"Error retrieving videos: {e}")
 
 
-def go_live(youtube: build, broadcast_id: str, camera: str) -> None:
+@youtube_call_seconds.timed(call="go_live")
+def go_live(youtube: build, broadcast_id: str, camera: str, event_id: str | None = None) -> None:
     """Transition a scheduled broadcast to live with retry logic."""
     retries = 5
     for attempt in range(1, retries + 1):
@@ -222,7 +277,7 @@ def go_live(youtube: build, broadcast_id: str, camera: str) -> None:
             add_video_to_playlist(youtube, broadcast_id, PLAYLIST_ID)
             print_message(f"Broadcast {broadcast_id} is now live!")
             save_broadcast_id_to_redis(camera, broadcast_id)
-            set_thumbnail(youtube, broadcast_id, camera)
+            set_thumbnail(youtube, broadcast_id, camera, event_id)
             return  # Exit the function on successful execution
 
         except HttpError as e:
@@ -244,11 +299,15 @@ def go_live(youtube: build, broadcast_id: str, camera: str) -> None:
 
 
 
+@youtube_call_seconds.timed(call="go_end_stream")
 def go_end_stream(camera: str) -> None:
     """Transition a scheduled broadcast to end the stream."""
     youtube = get_authenticated_service()
     try:
         broadcast_id = get_broadcast_id_from_redis(camera)
+        if not broadcast_id:
+            # Already ended (or never went live)
+            return
         youtube.liveBroadcasts().transition(
             part="status",
             broadcastStatus="complete",  # Mark the stream as complete (ended)
@@ -267,8 +326,9 @@ def gen_start_time() -> datetime:
             datetime.timedelta(hours=2)).isoformat()
 
 
-def start_youtube_broadcast_stream(camera: str) -> str:
-    youtube = get_authenticated_service()
+@youtube_call_seconds.timed(call="prepare_broadcast")
+def prepare_broadcast(youtube: build, camera: str) -> str:
+    """Create a scheduled broadcast and bind it to the camera's stream, ready for go_live."""
     start_time = gen_start_time()
     title, description = gen_stream_name_desc(camera, start_time)
 
@@ -278,15 +338,27 @@ def start_youtube_broadcast_stream(camera: str) -> str:
     broadcast_id = broadcast_response['id']
     print_message(f"Scheduled Broadcast Created: {broadcast_id}")
 
-    stream_id = get_existing_stream_id(youtube, camera)
+    stream_id = get_cached_stream_id(youtube, camera)
     if not stream_id:
         print_message("Stream not found.")
-        exit()
+        raise Exception(f"No YouTube stream named {camera}")
 
     bind_response = bind_stream_to_broadcast(youtube, broadcast_id, stream_id)
     print_message(f"Stream linked to broadcast: {bind_response['id']}")
+    return broadcast_id
+
+
+@youtube_call_seconds.timed(call="start_youtube_broadcast_stream")
+def start_youtube_broadcast_stream(camera: str, broadcast_id: str | None = None, event_id: str | None = None) -> str:
+    """
+    Take a broadcast live. broadcast_id is a pre-provisioned one; without it a new one is prepared.
+    event_id picks the detection thumbnail for the broadcast.
+    """
+    youtube = get_authenticated_service()
+    if not broadcast_id:
+        broadcast_id = prepare_broadcast(youtube, camera)
 
-    go_live(youtube, broadcast_id, camera)
+    go_live(youtube, broadcast_id, camera, event_id)
     print_message(f"Broadcast {broadcast_id} is now live!")
     video_link = f"{VIDEO_URL}{broadcast_id}"
     return video_link